@@ -0,0 +1,204 @@
+"""Асинхронные вьюхи чтения для ASGI (foodgram.asgi).
+
+Обрабатывают GET самых частых маршрутов через async ORM и отдают тот же
+JSON, что и вьюсеты DRF: фильтры и пагинацию рецептов выполняют те же
+RecipeFilter и CustomPaginator через sync_to_async. Остальные методы,
+неподдержанные параметры и ответы с ошибками передаются синхронному
+вьюсету с тем же адресом.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.urls import resolve
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from recipes.models import Ingredient, Tag
+from .authentication import aauthenticate
+from .autocomplete import FIELDS as INGREDIENT_FIELDS
+from .autocomplete import ingredient_index
+from .caching import acached_response, aconditional_response, aget_versions
+from .constants import INGREDIENTS_CACHE, INGREDIENTS_LIMIT, TAGS_CACHE
+from .filters import RecipeFilter
+from .pagination import CustomPaginator
+from .renderers import FastJSONRenderer
+from .representations import (RECIPE_FIELDS, TAG_FIELDS, related_querysets,
+                              represent_recipes)
+from .views import RecipeViewSet
+
+SYNC_URLCONF = 'foodgram.urls'
+# Параметры, которые обрабатывает только вьюсет DRF.
+SYNC_ONLY_PARAMS = ('format', 'cursor')
+
+
+class Fallback(Exception):
+    """Запрос должен обработать синхронный вьюсет."""
+
+
+def accepts_json(request):
+    accept = request.headers.get('Accept', '')
+    return 'text/html' not in accept and 'indent=' not in accept
+
+
+async def sync_view(request):
+    """Вьюсет DRF, которому маршрут принадлежит в foodgram.urls."""
+    match = resolve(request.path_info, urlconf=SYNC_URLCONF)
+    return await sync_to_async(match.func)(
+        request, *match.args, **match.kwargs
+    )
+
+
+def read_view(view):
+    """Асинхронная вьюха для GET с передачей остального вьюсету DRF."""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if (
+            request.method == 'GET'
+            and accepts_json(request)
+            and not any(param in request.GET for param in SYNC_ONLY_PARAMS)
+        ):
+            user = await aauthenticate(request)
+            if user is not None:
+                request.user = user
+                try:
+                    response = await view(request, *args, **kwargs)
+                except Fallback:
+                    pass
+                else:
+                    patch_vary_headers(response, ('Accept', 'Authorization'))
+                    return response
+        return await sync_view(request)
+
+    # Проверку CSRF, как и для вьюсетов, выполняет DRF.
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+def json_response(data):
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        content_type=FastJSONRenderer.media_type,
+    )
+
+
+async def cached_or_fallback(namespace, request, build):
+    response = await acached_response(namespace, request, build)
+    if response is None:
+        raise Fallback
+    return response
+
+
+@read_view
+async def tag_list(request):
+    async def build():
+        return [tag async for tag in Tag.objects.values(*TAG_FIELDS)]
+
+    return await cached_or_fallback(TAGS_CACHE, request, build)
+
+
+@read_view
+async def tag_detail(request, pk):
+    async def build():
+        return await Tag.objects.filter(pk=pk).values(*TAG_FIELDS).afirst()
+
+    return await cached_or_fallback(TAGS_CACHE, request, build)
+
+
+@read_view
+async def ingredient_list(request):
+    async def build():
+        name = request.GET.get('name', '')
+        return await ingredient_index.asearch(
+            name, INGREDIENTS_LIMIT if name else None
+        )
+
+    return await cached_or_fallback(INGREDIENTS_CACHE, request, build)
+
+
+@read_view
+async def ingredient_detail(request, pk):
+    async def build():
+        return await Ingredient.objects.filter(pk=pk).values(
+            *INGREDIENT_FIELDS
+        ).afirst()
+
+    return await cached_or_fallback(INGREDIENTS_CACHE, request, build)
+
+
+def filter_recipes(request):
+    """Рецепты по RecipeFilter, как в RecipeViewSet.filter_queryset."""
+    filterset = RecipeFilter(
+        request.GET, RecipeViewSet.annotated(request.user), request=request
+    )
+    if not filterset.is_valid():
+        # Ответ 400 с ошибками фильтров строит вьюсет DRF.
+        raise Fallback
+    return filterset.qs
+
+
+def paginate_recipes(request, queryset):
+    """Страница CustomPaginator, как в RecipeViewSet.paginate_queryset."""
+    paginator = CustomPaginator()
+    try:
+        recipes = paginator.paginate_queryset(
+            queryset.values(*RECIPE_FIELDS), Request(request)
+        )
+    except NotFound:
+        raise Fallback
+    return paginator, recipes
+
+
+async def get_validator(request):
+    """Валидатор RecipeViewSet.get_validator."""
+    return RecipeViewSet.make_validator(
+        request,
+        FastJSONRenderer.media_type,
+        await aget_versions(
+            *RecipeViewSet.validator_namespaces(request.user)
+        ),
+    )
+
+
+async def represent(request, recipes, rendition):
+    related = ([], [], [])
+    if recipes:
+        related = [
+            [row async for row in queryset]
+            for queryset in related_querysets(
+                recipes, RecipeViewSet.authors(request.user)
+            )
+        ]
+    return represent_recipes(request, recipes, *related, rendition)
+
+
+@read_view
+async def recipe_list(request):
+    queryset = await sync_to_async(filter_recipes)(request)
+    etag, last_modified = await get_validator(request)
+
+    async def build(request):
+        paginator, recipes = await sync_to_async(paginate_recipes)(
+            request, queryset
+        )
+        return json_response(paginator.get_paginated_response(
+            await represent(request, recipes, 'card')
+        ).data)
+
+    return await aconditional_response(etag, last_modified, build, request)
+
+
+@read_view
+async def recipe_detail(request, pk):
+    queryset = RecipeViewSet.annotated(request.user).filter(pk=pk)
+    etag, last_modified = await get_validator(request)
+
+    async def build(request):
+        recipes = [row async for row in queryset.values(*RECIPE_FIELDS)]
+        if not recipes:
+            raise Fallback
+        return json_response((await represent(request, recipes, 'full'))[0])
+
+    return await aconditional_response(etag, last_modified, build, request)
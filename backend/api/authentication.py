@@ -0,0 +1,142 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.authentication import (TokenAuthentication,
+                                           get_authorization_header)
+
+from users.models import User
+from .caching import aget_version, get_version
+from .constants import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL, TOKENS_CACHE
+
+# Поля пользователя, которые меняются без смены версии его токенов
+# (UPDATE ... F() счётчиков и last_login при входе). В кеше их нет:
+# у request.user они отложены, загружаются из базы при обращении,
+# а save() их не пишет.
+UNCACHED_USER_FIELDS = (*User.counter_fields, 'last_login')
+
+
+def tokens_namespace(user_id):
+    """Версия токенов пользователя: меняется при выходе и изменении его."""
+    return f'{TOKENS_CACHE}:{user_id}'
+
+
+def copy_token(token):
+    """Копия токена и его пользователя: запрос может менять request.user,
+    не затрагивая кеш."""
+    token = copy.copy(token)
+    token.user = copy.copy(token.user)
+    return token
+
+
+class TokenCache:
+    """Ограниченный LRU «ключ -> Token с пользователем» в памяти процесса.
+
+    Запись действительна ttl секунд и пока не сменилась версия токенов
+    её пользователя (tokens_namespace): удаление токена и изменение
+    пользователя сбрасывают только его записи. Поля UNCACHED_USER_FIELDS
+    не кешируются.
+    """
+
+    def __init__(self, size=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._tokens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(токен, версия) или None, если записи нет или она истекла."""
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                return None
+            self._tokens.move_to_end(key)
+            return entry[:2]
+
+    def check(self, entry, version):
+        """Копия токена из entry, если его версия равна текущей, иначе None.
+
+        Заодно считает попадания и промахи.
+        """
+        fresh = entry is not None and entry[1] == version
+        with self._lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return copy_token(entry[0]) if fresh else None
+
+    def set(self, key, token, version):
+        token = copy_token(token)
+        for field in UNCACHED_USER_FIELDS:
+            token.user.__dict__.pop(field, None)
+        with self._lock:
+            self._tokens[key] = (token, version, time.monotonic() + self.ttl)
+            self._tokens.move_to_end(key)
+            while len(self._tokens) > self.size:
+                self._tokens.popitem(last=False)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса Token JOIN User на каждый запрос.
+
+    request.auth - объект Token, как и без кеша.
+    """
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        token = token_cache.check(entry, entry and get_version(
+            tokens_namespace(entry[0].user_id)
+        ))
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(
+                key, token, get_version(tokens_namespace(user.pk))
+            )
+            token = copy_token(token)
+        return token.user, token
+
+
+async def aauthenticate(request):
+    """Пользователь по заголовку Authorization для асинхронных вьюх.
+
+    None - токен передан, но не подходит: ответ с ошибкой тогда даёт
+    синхронный вьюсет.
+    """
+    auth = get_authorization_header(request).split()
+    keyword = CachedTokenAuthentication.keyword.lower().encode()
+    if not auth or auth[0].lower() != keyword:
+        return AnonymousUser()
+    if len(auth) != 2:
+        return None
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        return None
+    entry = token_cache.get(key)
+    token = token_cache.check(entry, entry and await aget_version(
+        tokens_namespace(entry[0].user_id)
+    ))
+    if token is not None:
+        return token.user
+    token = await CachedTokenAuthentication().get_model().objects.filter(
+        key=key
+    ).select_related('user').afirst()
+    if token is None or not token.user.is_active:
+        return None
+    token_cache.set(
+        key, token, await aget_version(tokens_namespace(token.user_id))
+    )
+    return copy_token(token).user
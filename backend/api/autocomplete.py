@@ -0,0 +1,84 @@
+import time
+from bisect import bisect_left
+
+from recipes.models import Ingredient
+
+from .caching import aget_version, get_version
+from .constants import INGREDIENT_INDEX_TTL, INGREDIENTS_CACHE
+
+FIELDS = ('id', 'name', 'measurement_unit')
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Названия в нижнем регистре хранятся отсортированными, поэтому
+    совпадения по началу строки находятся двоичным поиском. Индекс
+    перечитывается из БД при смене версии справочника ингредиентов
+    или по истечении ttl.
+    """
+
+    def __init__(self, ttl=INGREDIENT_INDEX_TTL):
+        self.ttl = ttl
+        self._index = None
+        self._version = None
+        self._loaded_at = 0
+
+    def store(self, rows, version):
+        rows = sorted(rows, key=lambda row: (row['name'].lower(), row['id']))
+        self._index = ([row['name'].lower() for row in rows], rows)
+        self._version = version
+        self._loaded_at = time.monotonic()
+        return self._index
+
+    def is_stale(self, version):
+        return (
+            self._index is None
+            or version != self._version
+            or time.monotonic() - self._loaded_at > self.ttl
+        )
+
+    def get(self):
+        version = get_version(INGREDIENTS_CACHE)
+        if self.is_stale(version):
+            return self.store(Ingredient.objects.values(*FIELDS), version)
+        return self._index
+
+    async def aget(self):
+        """get() для асинхронных вьюх: загрузка через async ORM."""
+        version = await aget_version(INGREDIENTS_CACHE)
+        if self.is_stale(version):
+            return self.store(
+                [row async for row in Ingredient.objects.values(*FIELDS)],
+                version,
+            )
+        return self._index
+
+    def search(self, query, limit=None):
+        """Ингредиенты, начинающиеся с query, затем содержащие query."""
+        return self.find(self.get(), query, limit)
+
+    async def asearch(self, query, limit=None):
+        return self.find(await self.aget(), query, limit)
+
+    @staticmethod
+    def find(index, query, limit):
+        keys, rows = index
+        query = query.lower()
+        if not query:
+            return rows[:limit]
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\uffff', start)
+        if limit is not None:
+            end = min(end, start + limit)
+        result = rows[start:end]
+        if limit is None or len(result) < limit:
+            for key, row in zip(keys, rows):
+                if query in key and not key.startswith(query):
+                    result.append(row)
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,192 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .constants import RESPONSE_CACHE_TIMEOUT, VERSION_TIMEOUT
+from .renderers import FastJSONRenderer
+
+
+def version_key(namespace):
+    return f'api:{namespace}:version'
+
+
+def get_version(namespace):
+    """Версия данных справочника; заодно время последнего изменения."""
+    version = cache.get(version_key(namespace))
+    if version is None:
+        cache.add(
+            version_key(namespace), time.time(), VERSION_TIMEOUT
+        )
+        version = cache.get(version_key(namespace), time.time())
+    return version
+
+
+async def aget_version(namespace):
+    """Асинхронный вариант get_version."""
+    version = await cache.aget(version_key(namespace))
+    if version is None:
+        await cache.aadd(
+            version_key(namespace), time.time(), VERSION_TIMEOUT
+        )
+        version = await cache.aget(version_key(namespace), time.time())
+    return version
+
+
+def get_versions(*namespaces):
+    """Версии нескольких пространств одним обращением к кешу."""
+    keys = [version_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    return [
+        found[key] if key in found else get_version(namespace)
+        for key, namespace in zip(keys, namespaces)
+    ]
+
+
+async def aget_versions(*namespaces):
+    """Асинхронный вариант get_versions."""
+    keys = [version_key(namespace) for namespace in namespaces]
+    found = await cache.aget_many(keys)
+    return [
+        found[key] if key in found else await aget_version(namespace)
+        for key, namespace in zip(keys, namespaces)
+    ]
+
+
+def bump_version(namespace):
+    """Делает недействительными все закешированные ответы справочника."""
+    cache.set(version_key(namespace), time.time(), VERSION_TIMEOUT)
+
+
+def response_key(namespace, version, request, media_type):
+    """Ключ ответа; media_type различает, например, ответы с indent.
+
+    Адрес и media_type хешируются: в ключах memcached нельзя пробелы
+    и длину больше 250 символов.
+    """
+    digest = hashlib.md5(
+        f'{media_type}:{request.get_full_path()}'.encode()
+    ).hexdigest()
+    return f'api:{namespace}:{version}:{digest}'
+
+
+def cached_body(data, renderer=None, media_type=None, renderer_context=None):
+    """Тело ответа и ETag для кеша ответов."""
+    renderer = renderer or FastJSONRenderer()
+    body = renderer.render(data, media_type, renderer_context)
+    return body, quote_etag(hashlib.md5(body).hexdigest())
+
+
+def cached_http_response(request, cached, version, content_type):
+    """Ответ из кеша с ETag/Last-Modified или 304."""
+    body, etag = cached
+    response = HttpResponse(body, content_type=content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(version)
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(version),
+        response=response,
+    )
+
+
+async def acached_response(namespace, request, build):
+    """Асинхронный вариант CachedResponseMixin для JSON.
+
+    build() - корутина, возвращающая данные ответа или None, если
+    ответ должен дать синхронный вьюсет (например, 404). Кеш общий
+    с CachedResponseMixin.
+    """
+    version = await aget_version(namespace)
+    key = response_key(
+        namespace, version, request, FastJSONRenderer.media_type
+    )
+    cached = await cache.aget(key)
+    if cached is None:
+        data = await build()
+        if data is None:
+            return None
+        cached = cached_body(data)
+        await cache.aset(key, cached, RESPONSE_CACHE_TIMEOUT)
+    return cached_http_response(
+        request, cached, version, FastJSONRenderer.media_type
+    )
+
+
+def conditional_response(etag, last_modified, method, request, *args,
+                         **kwargs):
+    """Ответ 304 без вызова method, если валидатор клиента актуален.
+
+    Ответ зависит от пользователя, поэтому добавляется Vary: Authorization.
+    """
+    response = None
+    if etag:
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified
+        )
+    if response is None:
+        response = method(request, *args, **kwargs)
+    return set_validator(response, etag, last_modified)
+
+
+async def aconditional_response(etag, last_modified, build, request):
+    """conditional_response для асинхронных вьюх: build - корутина."""
+    response = None
+    if etag:
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+    if response is None:
+        response = await build(request)
+    return set_validator(response, etag, last_modified)
+
+
+def set_validator(response, etag, last_modified):
+    if etag and response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class CachedResponseMixin:
+    """Кеширование готовых JSON-ответов list/retrieve с ETag и 304."""
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, method, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if renderer.format != 'json':
+            return method(request, *args, **kwargs)
+        version = get_version(self.cache_namespace)
+        key = response_key(
+            self.cache_namespace, version, request,
+            request.accepted_media_type,
+        )
+        cached = cache.get(key)
+        if cached is None:
+            response = method(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            cached = cached_body(
+                response.data,
+                renderer,
+                request.accepted_media_type,
+                self.get_renderer_context(),
+            )
+            cache.set(key, cached, RESPONSE_CACHE_TIMEOUT)
+        return cached_http_response(
+            request._request, cached, version, renderer.media_type
+        )
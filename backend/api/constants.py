@@ -4,3 +4,30 @@ MAX_LENGHT_USER = 150
 MAX_LENGHT_EMAIL = 254
 VALID_MIN = 1
 VALID_MAX = 32767
+CHUNK_SIZE = 2000
+INGREDIENT_INDEX_TTL = 300
+INGREDIENTS_LIMIT = 20
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+# Версии кеша не истекают: ответы и ETag сбрасывает только bump_version.
+VERSION_TIMEOUT = None
+TAGS_CACHE = 'tags'
+INGREDIENTS_CACHE = 'ingredients'
+IMAGE_MAX_SIDE = 6000
+IMAGE_QUALITY = 80
+IMAGE_WORKERS = 2
+IMAGE_RENDITIONS = {
+    'thumbnail': (240, 240),
+    'card': (640, 640),
+    'full': (1600, 1600),
+}
+BASE64_CHUNK_SIZE = 64 * 1024
+RECIPES_CACHE = 'recipes'
+SEARCH_CONFIG = 'russian'
+SEARCH_INDEX_TTL = 300
+SEARCH_LIMIT = 500
+SEARCH_JOURNAL_LIMIT = 1000
+TRIGRAM_THRESHOLD = 0.3
+VIEWER_STATE_TTL = 60
+TOKENS_CACHE = 'tokens'
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 60
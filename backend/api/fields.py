@@ -0,0 +1,107 @@
+import base64
+import binascii
+import re
+
+import filetype
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import exceptions, serializers
+
+from .constants import BASE64_CHUNK_SIZE
+
+# Символы вне алфавита base64 (переводы строк и т.п.) b64decode
+# отбрасывает; отбрасываем их до деления на части.
+NOT_BASE64 = re.compile(r'[^A-Za-z0-9+/=]')
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    """Base64ImageField, декодирующий изображение по частям во временный файл.
+
+    Размер проверяется по длине строки ещё до декодирования, а Pillow
+    проверяет изображение с диска, без лишних копий в памяти.
+    """
+
+    def __init__(self, *args, max_size=None, **kwargs):
+        self.max_size = max_size
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            return super().to_internal_value(base64_data)
+        content_type = None
+        header, separator, data = base64_data.partition(';base64,')
+        if not separator:
+            data = header
+        elif self.trust_provided_content_type:
+            content_type = header.replace('data:', '')
+        max_size = self.max_size or settings.RECIPE_IMAGE_MAX_SIZE
+        if len(data) // 4 * 3 > max_size:
+            raise exceptions.ValidationError(
+                f'Изображение больше {max_size} байт!'
+            )
+        file = TemporaryUploadedFile(
+            self.get_file_name(None), content_type, 0, None
+        )
+        try:
+            remainder = ''
+            for start in range(0, len(data), BASE64_CHUNK_SIZE):
+                chunk = remainder + NOT_BASE64.sub(
+                    '', data[start:start + BASE64_CHUNK_SIZE]
+                )
+                # Декодируется кратная 4 часть, остаток - со следующей.
+                end = len(chunk) - len(chunk) % 4
+                file.write(base64.b64decode(chunk[:end]))
+                remainder = chunk[end:]
+            file.write(base64.b64decode(remainder))
+            file.size = file.tell()
+            file.seek(0)
+            extension = self.guess_extension(file.temporary_file_path())
+            if extension not in self.ALLOWED_TYPES:
+                raise exceptions.ValidationError(self.INVALID_TYPE_MESSAGE)
+            file.name = f'{file.name}.{extension}'
+            # Минуя повторное декодирование в Base64FieldMixin.
+            return serializers.ImageField.to_internal_value(self, file)
+        except (TypeError, binascii.Error, ValueError):
+            file.close()
+            raise exceptions.ValidationError(self.INVALID_FILE_MESSAGE)
+        except Exception:
+            file.close()
+            raise
+
+    def guess_extension(self, path):
+        extension = filetype.guess_extension(path)
+        if extension is None:
+            try:
+                with Image.open(path) as image:
+                    extension = image.format.lower()
+            except OSError:
+                raise exceptions.ValidationError(self.INVALID_FILE_MESSAGE)
+        return 'jpg' if extension == 'jpeg' else extension
+
+
+class RenditionField(serializers.ImageField):
+    """Ссылка на копию изображения рецепта, пока её нет - на оригинал.
+
+    list_rendition используется вместо rendition в списках рецептов.
+    """
+
+    def __init__(self, rendition, list_rendition=None, **kwargs):
+        self.rendition = rendition
+        self.list_rendition = list_rendition or rendition
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        view = self.context.get('view')
+        rendition = (
+            self.list_rendition
+            if getattr(view, 'detail', None) is False
+            else self.rendition
+        )
+        return super().to_representation(
+            getattr(recipe, f'image_{rendition}') or recipe.image
+        )
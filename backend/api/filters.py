@@ -1,15 +1,24 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Recipe, Tag
 
+RecipeTag = Recipe.tags.through
+POPULAR_ORDERING = ('-favorites_count', '-pub_date', '-id')
 
-class IngredientFilter(FilterSet):
-    """Фильтр ингредиентов."""
-    name = filters.CharFilter(lookup_expr='startswith')
 
-    class Meta:
-        fields = ('name', )
-        model = Ingredient
+def filter_by_tags(queryset, tags, mode=None):
+    """Теги через EXISTS по recipe_tags: без JOIN и дублей рецептов."""
+    if not tags:
+        return queryset
+    if mode == 'all':
+        return queryset.filter(*(
+            Exists(RecipeTag.objects.filter(recipe=OuterRef('pk'), tag=tag))
+            for tag in tags
+        ))
+    return queryset.filter(Exists(RecipeTag.objects.filter(
+        recipe=OuterRef('pk'), tag__in=tags
+    )))
 
 
 class RecipeFilter(FilterSet):
@@ -18,6 +27,11 @@ class RecipeFilter(FilterSet):
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=(('any', 'Любой из тегов'), ('all', 'Все теги')),
+        method='filter_tags_mode',
     )
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited'
@@ -25,11 +39,26 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'По числу добавлений в избранное'),),
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author',)
 
+    def filter_tags(self, queryset, name, value):
+        return filter_by_tags(
+            queryset,
+            {tag.pk for tag in value},
+            self.form.cleaned_data.get('tags_mode'),
+        )
+
+    def filter_tags_mode(self, queryset, name, value):
+        """Режим применяется в filter_tags."""
+        return queryset
+
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
@@ -41,3 +70,7 @@ class RecipeFilter(FilterSet):
         if value and not user.is_anonymous:
             return queryset.filter(shopping_cart__user=user)
         return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        """Популярные первыми: по счётчику, без COUNT по избранному."""
+        return queryset.order_by(*POPULAR_ORDERING)
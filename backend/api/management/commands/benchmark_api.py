@@ -0,0 +1,388 @@
+import json
+import random
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+from api.urls import router
+from foodgram.settings import BASE_DIR
+from recipes.counters import reconcile_counters
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscribe, User
+
+BUDGET_PATH = Path(BASE_DIR, 'data', 'query_budget.json')
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1Pe'
+    'AAAADElEQVR4nGP4//8/AAX+Av4N70a4AAAAAElFTkSuQmCC'
+)
+TAGS_COUNT = 3
+
+Step = namedtuple(
+    'Step', ('route', 'method', 'url', 'payload', 'anonymous', 'label')
+)
+
+
+def step(route, method='get', kwargs=None, query='', payload=None,
+         anonymous=False, variant=None):
+    """Описание одного запроса сценария."""
+    if callable(kwargs):
+        def url(state):
+            return reverse(route, kwargs=kwargs(state)) + query
+    else:
+        def url(state):
+            return reverse(route, kwargs=kwargs) + query
+    label = f'{method.upper()} {route}{variant or query}'
+    if anonymous:
+        label += ' (anonymous)'
+    return Step(route, method, url, payload, anonymous, label)
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[round(percent / 100 * (len(ordered) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет БД синтетическими данными, обходит маршруты api/urls.py '
+        'и сверяет число SQL-запросов и задержки с бюджетом. '
+        'Работает с БД из настроек (SQLite или PostgreSQL); по умолчанию '
+        'все изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50,
+                            help='Количество пользователей')
+        parser.add_argument('--recipes', type=int, default=300,
+                            help='Количество рецептов')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Количество замеров каждого запроса')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора данных')
+        parser.add_argument('--budget', type=Path, default=BUDGET_PATH,
+                            help='Путь к файлу бюджета')
+        parser.add_argument('--write-budget', action='store_true',
+                            help='Сохранить текущие замеры как бюджет')
+        parser.add_argument('--check-latency', action='store_true',
+                            help='Проверять p95 задержки помимо запросов')
+        parser.add_argument('--keep-data', action='store_true',
+                            help='Не откатывать синтетические данные')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('Нужно минимум 2 пользователя и 1 рецепт.')
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть положительным.')
+        images = []
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            with transaction.atomic():
+                data = self.seed(options)
+                results = self.run(data, options['repeat'], images)
+                if not options['keep_data']:
+                    transaction.set_rollback(True)
+        for name in images:
+            default_storage.delete(name)
+        self.report(results)
+        self.stdout.write(
+            f'Кеш токенов: {token_cache.hit_rate:.0%} попаданий '
+            f'({token_cache.hits}/{token_cache.hits + token_cache.misses})'
+        )
+        self.report_uncovered(results)
+        if options['write_budget']:
+            self.write_budget(options['budget'], results)
+            return
+        self.check_budget(
+            options['budget'], results, options['check_latency']
+        )
+
+    def seed(self, options):
+        """Синтетические пользователи, рецепты, избранное и подписки."""
+        rng = random.Random(options['seed'])
+        if not Ingredient.objects.exists():
+            call_command('download_data', stdout=self.stdout)
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        run = f'bench{int(time.time())}'
+        tags = Tag.objects.bulk_create(
+            Tag(
+                name=f'{run}_tag_{i}',
+                color=f'#{rng.randrange(16 ** 6):06X}',
+                slug=f'{run}_tag_{i}',
+            ) for i in range(TAGS_COUNT)
+        )
+        users = User.objects.bulk_create(
+            User(
+                email=f'{run}_{i}@example.com',
+                username=f'{run}_{i}',
+                first_name='Bench',
+                last_name=str(i),
+                password='!',
+            ) for i in range(options['users'])
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=rng.choice(users),
+                name=f'{run} рецепт {i}',
+                text='Синтетический рецепт для замеров.',
+                image='bench.png',
+                cooking_time=rng.randint(1, 120),
+            ) for i in range(options['recipes'])
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in rng.sample(tags, rng.randint(1, TAGS_COUNT))
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient,
+                amount=rng.randint(1, 500),
+            )
+            for recipe in recipes
+            for ingredient in rng.sample(ingredients, rng.randint(3, 10))
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                model(user=user, recipe=recipe)
+                for user in users
+                for recipe in rng.sample(
+                    recipes, min(len(recipes), rng.randint(1, 20))
+                )
+            )
+        Subscribe.objects.bulk_create(
+            Subscribe(user=user, author=author)
+            for user in users
+            for author in rng.sample(users, min(len(users), 10))
+            if author != user
+        )
+        # bulk_create не отправляет сигналы, счётчики считаются заново.
+        reconcile_counters()
+        user = users[0]
+        return {
+            'user': user,
+            'token': Token.objects.create(user=user).key,
+            'author': Subscribe.objects.filter(user=user).first().author,
+            'stranger': User.objects.filter(
+                username__startswith=run
+            ).exclude(subscribing__user=user).exclude(pk=user.pk).first(),
+            'recipe': recipes[0],
+            'free_recipe': Recipe.objects.filter(
+                name__startswith=run
+            ).exclude(favorites__user=user).exclude(
+                shopping_cart__user=user
+            ).first(),
+            'tags': tags,
+            'ingredient': Ingredient.objects.get(pk=ingredients[0]),
+            'ingredients': rng.sample(ingredients, 5),
+        }
+
+    def get_scenarios(self, data):
+        """Группы запросов; запросы группы выполняются по порядку."""
+        recipe = {'pk': data['recipe'].pk}
+        tags = '&'.join(f'tags={tag.slug}' for tag in data['tags'][:2])
+        update_payload = {
+            'name': 'Замер',
+            'text': 'Рецепт, созданный при замере.',
+            'cooking_time': 10,
+            'tags': [tag.pk for tag in data['tags'][:2]],
+            'ingredients': [
+                {'id': ingredient, 'amount': 10}
+                for ingredient in data['ingredients']
+            ],
+        }
+        create_payload = {**update_payload, 'image': IMAGE}
+
+        def created(state):
+            return {'pk': state['last'].data['id']}
+
+        scenarios = [
+            (step('tag-list'),),
+            (step('tag-detail', kwargs={'pk': data['tags'][0].pk}),),
+            (step('ingredient-list'),),
+            (step('ingredient-list',
+                  query=f'?name={data["ingredient"].name[:3]}',
+                  variant='?name=<prefix>'),),
+            (step('ingredient-detail',
+                  kwargs={'pk': data['ingredient'].pk}),),
+            (step('recipe-list'),),
+            (step('recipe-list', anonymous=True),),
+            (step('recipe-list', query='?limit=50'),),
+            (step('recipe-list', query='?cursor='),),
+            (step('recipe-list', query='?is_favorited=1'),),
+            (step('recipe-list', query='?is_in_shopping_cart=1'),),
+            (step('recipe-list', query='?ordering=popular'),),
+            (step('recipe-list', query=f'?{tags}',
+                  variant='?tags=<slug>&tags=<slug>'),),
+            (step('recipe-list', query=f'?{tags}&tags_mode=all',
+                  variant='?tags=<slug>&tags=<slug>&tags_mode=all'),),
+            (step('recipe-list', query=f'?author={data["author"].pk}',
+                  variant='?author=<id>'),),
+            (step('recipe-detail', kwargs=recipe),),
+            (step('recipe-search', query='?q=рецепт'),),
+            (step('recipe-cookable',
+                  query='?ingredients='
+                  + ','.join(map(str, data['ingredients'][:3])),
+                  variant='?ingredients=<ids>'),),
+            (step('recipe-download-shopping-cart'),),
+            (
+                step('recipe-list', 'post', payload=create_payload),
+                step('recipe-detail', 'patch', kwargs=created,
+                     payload=update_payload),
+                step('recipe-detail', 'delete', kwargs=created),
+            ),
+            (step('user-list'),),
+            (step('user-detail', kwargs={'id': data['author'].pk}),),
+            (step('user-me'),),
+            (step('user-subscriptions'),),
+            (step('user-subscriptions', query='?recipes_limit=3'),),
+            (step('user-subscriptions', query='?cursor='),),
+        ]
+        if data['free_recipe']:
+            free_recipe = {'pk': data['free_recipe'].pk}
+            scenarios += [
+                (
+                    step('recipe-favorite', 'post', kwargs=free_recipe),
+                    step('recipe-favorite', 'delete', kwargs=free_recipe),
+                ),
+                (
+                    step('recipe-shopping-cart', 'post', kwargs=free_recipe),
+                    step('recipe-shopping-cart', 'delete',
+                         kwargs=free_recipe),
+                ),
+            ]
+        if data['stranger']:
+            stranger = {'id': data['stranger'].pk}
+            scenarios.append((
+                step('user-subscribe', 'post', kwargs=stranger),
+                step('user-subscribe', 'delete', kwargs=stranger),
+            ))
+        return scenarios
+
+    def run(self, data, repeat, images):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {data["token"]}')
+        anonymous = APIClient()
+        results = {}
+        scenarios = self.get_scenarios(data)
+        # Первый проход прогревает кеши и не учитывается.
+        for iteration in range(repeat + 1):
+            for scenario in scenarios:
+                state = {}
+                for current in scenario:
+                    response, queries, elapsed = self.request(
+                        anonymous if current.anonymous else client,
+                        current, state,
+                    )
+                    if response.status_code >= 400:
+                        raise CommandError(
+                            f'{current.label}: {response.status_code} '
+                            f'{getattr(response, "data", "")}'
+                        )
+                    if current.method == 'post' and (
+                        current.route == 'recipe-list'
+                    ):
+                        images.append(Recipe.objects.get(
+                            pk=response.data['id']
+                        ).image.name)
+                    state['last'] = response
+                    if not iteration:
+                        continue
+                    result = results.setdefault(
+                        current.label,
+                        {'route': current.route, 'queries': 0, 'times': []},
+                    )
+                    result['queries'] = max(result['queries'], queries)
+                    result['times'].append(elapsed)
+        return results
+
+    @staticmethod
+    def request(client, current, state):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = getattr(client, current.method)(
+                current.url(state), current.payload, format='json'
+            )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - start) * 1000
+        return response, len(context.captured_queries), elapsed
+
+    def report(self, results):
+        width = max(len(label) for label in results)
+        self.stdout.write(
+            f'{"Запрос".ljust(width)}  {"SQL":>4}  '
+            f'{"mean":>8}  {"p50":>8}  {"p95":>8}  (мс)'
+        )
+        for label, result in results.items():
+            times = result['times']
+            self.stdout.write(
+                f'{label.ljust(width)}  {result["queries"]:>4}  '
+                f'{sum(times) / len(times):>8.2f}  '
+                f'{percentile(times, 50):>8.2f}  '
+                f'{percentile(times, 95):>8.2f}'
+            )
+
+    def report_uncovered(self, results):
+        covered = {result['route'] for result in results.values()}
+        uncovered = sorted({
+            url.name for url in router.urls
+            if url.name not in covered and url.name != 'api-root'
+        })
+        if uncovered:
+            self.stdout.write(self.style.WARNING(
+                'Маршруты без замеров: ' + ', '.join(uncovered)
+            ))
+
+    def write_budget(self, path, results):
+        budget = {
+            label: {
+                'queries': result['queries'],
+                'p95_ms': round(percentile(result['times'], 95) * 2, 1),
+            }
+            for label, result in results.items()
+        }
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(budget, file, ensure_ascii=False, indent=4)
+            file.write('\n')
+        self.stdout.write(self.style.SUCCESS(f'Бюджет сохранён в {path}'))
+
+    def check_budget(self, path, results, check_latency):
+        try:
+            with open(path, encoding='utf-8') as file:
+                budget = json.load(file)
+        except FileNotFoundError:
+            raise CommandError(
+                f'Файл бюджета {path} не найден, запустите с --write-budget.'
+            )
+        errors = []
+        for label, result in results.items():
+            if label not in budget:
+                errors.append(f'{label}: нет в бюджете')
+                continue
+            limit = budget[label]
+            if result['queries'] > limit['queries']:
+                errors.append(
+                    f'{label}: {result["queries"]} SQL-запросов, '
+                    f'бюджет {limit["queries"]}'
+                )
+            p95 = percentile(result['times'], 95)
+            if check_latency and p95 > limit['p95_ms']:
+                errors.append(
+                    f'{label}: p95 {p95:.2f} мс, бюджет {limit["p95_ms"]} мс'
+                )
+        if errors:
+            raise CommandError(
+                'Превышен бюджет производительности:\n' + '\n'.join(errors)
+            )
+        self.stdout.write(self.style.SUCCESS('Бюджет соблюдён.'))
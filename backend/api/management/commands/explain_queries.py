@@ -0,0 +1,147 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+# Справочники из десятков строк дешевле прочитать целиком.
+ALLOWED_SCANS = ('recipes_tag',)
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+SQLITE_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?: AS \w+)?(.*)')
+# Подзапросы, в том числе qualify - обёртка Django для фильтра по оконной
+# функции: их строки уже отобраны внутренним запросом.
+SQLITE_SKIP = ('CONSTANT', 'subquery', 'qualify')
+
+
+def sequential_scans(plan):
+    """Таблицы, которые план читает целиком, без индекса."""
+    if connection.vendor == 'postgresql':
+        return set(POSTGRES_SCAN.findall(plan))
+    return {
+        table for table, rest in SQLITE_SCAN.findall(plan)
+        if 'USING' not in rest and table not in SQLITE_SKIP
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для SQL-запросов основных GET-маршрутов API '
+        'на текущих данных и сообщает о последовательных чтениях таблиц.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int,
+                            help='id пользователя, от имени которого '
+                                 'выполняются запросы')
+        parser.add_argument('--allow', nargs='*', default=ALLOWED_SCANS,
+                            help='Таблицы, которые можно читать целиком')
+        parser.add_argument('--force-index', action='store_true',
+                            help='Postgres: enable_seqscan=off, чтобы '
+                                 'Seq Scan остался только там, где '
+                                 'нет подходящего индекса')
+        parser.add_argument('--fail', action='store_true',
+                            help='Завершиться с ошибкой, если найдены '
+                                 'последовательные чтения')
+
+    def handle(self, *args, **options):
+        user = (
+            User.objects.get(pk=options['user']) if options['user']
+            else User.objects.filter(recipes__isnull=False).first()
+        )
+        if user is None:
+            raise CommandError('Нет данных: нужен хотя бы один рецепт.')
+        found = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            with transaction.atomic():
+                if options['force_index']:
+                    if connection.vendor != 'postgresql':
+                        raise CommandError(
+                            '--force-index поддерживается только в Postgres.'
+                        )
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                for label, queries in self.get_queries(user):
+                    scans = set()
+                    for sql in queries:
+                        scans |= sequential_scans(self.explain(sql))
+                    scans -= set(options['allow'])
+                    found[label] = scans
+                    self.stdout.write(
+                        f'{label}\n    запросов: {len(queries)}, '
+                        'чтение целиком: '
+                        + (
+                            self.style.WARNING(', '.join(sorted(scans)))
+                            if scans else self.style.SUCCESS('нет')
+                        )
+                    )
+        if options['fail'] and any(found.values()):
+            raise CommandError('Есть последовательные чтения таблиц.')
+
+    def get_queries(self, user):
+        """Пары (маршрут, SELECT-запросы, выполненные при его обработке)."""
+        client = APIClient()
+        client.force_authenticate(user)
+        recipe = (
+            Recipe.objects.filter(author=user).first()
+            or Recipe.objects.first()
+        )
+        tags = '&'.join(
+            f'tags={slug}'
+            for slug in Tag.objects.values_list('slug', flat=True)[:2]
+        )
+        ingredients = ','.join(map(str, RecipeIngredient.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', flat=True)[:3]))
+        ingredient = Ingredient.objects.filter(
+            recipes=recipe
+        ).values_list('name', flat=True).first() or ''
+        urls = (
+            '/api/recipes/',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1',
+            '/api/recipes/?ordering=popular',
+            f'/api/recipes/?author={user.pk}',
+            f'/api/recipes/?{tags}',
+            f'/api/recipes/?{tags}&tags_mode=all',
+            '/api/recipes/?cursor=',
+            f'/api/recipes/{recipe.pk}/',
+            f'/api/recipes/search/?q={recipe.name.split()[0]}',
+            f'/api/recipes/cookable/?ingredients={ingredients}',
+            '/api/recipes/download_shopping_cart/',
+            '/api/users/subscriptions/?recipes_limit=3',
+        )
+        for url in urls:
+            # Первый запрос загружает индексы в памяти процесса.
+            client.get(url)
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            yield url, self.selects(context)
+        with CaptureQueriesContext(connection) as context:
+            list(Ingredient.objects.annotate(
+                lower_name=Lower('name')
+            ).filter(lower_name__startswith=ingredient[:3].lower())[:20])
+        yield 'ingredient: lower(name) LIKE prefix%', self.selects(context)
+
+    @staticmethod
+    def selects(context):
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].lstrip().upper().startswith('SELECT')
+        ]
+
+    @staticmethod
+    def explain(sql):
+        prefix = (
+            'EXPLAIN' if connection.vendor == 'postgresql'
+            else 'EXPLAIN QUERY PLAN'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}')
+            return '\n'.join(' '.join(map(str, row)) for row in cursor)
@@ -0,0 +1,121 @@
+import http.client
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark_api import percentile
+
+PATHS = (
+    '/api/tags/',
+    '/api/ingredients/?name=%D0%BC%D0%BE',
+    '/api/recipes/',
+    '/api/recipes/?limit=50',
+)
+# Медленный клиент досылает по байту заголовка с этим интервалом.
+SLOW_INTERVAL = 0.5
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест запущенного сервера (WSGI или ASGI): '
+        'параллельные GET-запросы, пропускная способность и задержки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Адрес сервера, '
+                                        'например http://127.0.0.1:8000')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Маршрут; можно указать несколько раз')
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help='Число параллельных клиентов')
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Запросов на каждый маршрут')
+        parser.add_argument('--token', help='Токен для заголовка '
+                                            'Authorization')
+        parser.add_argument('--timeout', type=float, default=10,
+                            help='Таймаут запроса, с; не дождавшийся '
+                                 'ответа запрос считается ошибкой')
+        parser.add_argument('--slow', type=int, default=0,
+                            help='Медленных клиентов, которые всё время '
+                                 'теста держат соединение, досылая '
+                                 'заголовки по байту')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Нужен адрес вида http://host:port.')
+        self.address = (url.hostname, url.port or 80)
+        self.timeout = options['timeout']
+        self.headers = {'Accept': 'application/json'}
+        if options['token']:
+            self.headers['Authorization'] = f'Token {options["token"]}'
+        stop = threading.Event()
+        slow = [
+            threading.Thread(target=self.slow_client, args=(stop,),
+                             daemon=True)
+            for _ in range(options['slow'])
+        ]
+        for thread in slow:
+            thread.start()
+        time.sleep(SLOW_INTERVAL if slow else 0)
+        try:
+            self.stdout.write(
+                f'{"Маршрут":<40}  {"rps":>8}  {"p50":>8}  {"p95":>8}  '
+                f'{"p99":>8}  {"ошибки":>6}  (мс)'
+            )
+            for path in options['paths'] or PATHS:
+                self.report(path, *self.run(
+                    path, options['concurrency'], options['requests']
+                ))
+        finally:
+            stop.set()
+
+    def run(self, path, concurrency, total):
+        local = threading.local()
+
+        def request(_):
+            connection = getattr(local, 'connection', None)
+            if connection is None:
+                connection = local.connection = http.client.HTTPConnection(
+                    *self.address, timeout=self.timeout
+                )
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=self.headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                local.connection = None
+                ok = False
+            return (time.perf_counter() - start) * 1000, ok
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(request, range(total)))
+        elapsed = time.perf_counter() - start
+        return elapsed, results
+
+    def report(self, path, elapsed, results):
+        times = [duration for duration, _ in results]
+        errors = sum(not ok for _, ok in results)
+        self.stdout.write(
+            f'{path:<40}  {len(results) / elapsed:>8.1f}  '
+            f'{percentile(times, 50):>8.2f}  {percentile(times, 95):>8.2f}  '
+            f'{percentile(times, 99):>8.2f}  {errors:>6}'
+        )
+
+    def slow_client(self, stop):
+        """Клиент на медленной сети: запрос не дочитан до конца теста."""
+        try:
+            with socket.create_connection(self.address) as sock:
+                sock.sendall(b'GET /api/tags/ HTTP/1.1\r\n')
+                while not stop.wait(SLOW_INTERVAL):
+                    sock.sendall(b'X')
+        except OSError:
+            pass
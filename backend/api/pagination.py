@@ -1,9 +1,56 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 from .constants import PAGE_SIZE
 
 
+class KeysetPaginator(CursorPagination):
+    """Пагинация по ключу: без OFFSET и по умолчанию без COUNT(*)."""
+    page_size = PAGE_SIZE
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = {'count': self.count, **response.data}
+        return response
+
+
 class CustomPaginator(PageNumberPagination):
-    """Пагинация для вывода 6 элементов на странице + limit."""
+    """Пагинация для вывода 6 элементов на странице + limit.
+
+    Если у вьюсета задан cursor_ordering, параметр cursor переключает
+    выдачу на KeysetPaginator с этим порядком; get_cursor_ordering()
+    вьюсета, если есть, возвращает порядок, действующий в запросе.
+    """
     page_size = PAGE_SIZE
     page_size_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering and (
+            KeysetPaginator.cursor_query_param in request.query_params
+        ):
+            if hasattr(view, 'get_cursor_ordering'):
+                ordering = view.get_cursor_ordering()
+            self.keyset = KeysetPaginator()
+            self.keyset.ordering = ordering
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.keyset:
+            return self.keyset.to_html()
+        return super().to_html()
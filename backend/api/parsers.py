@@ -0,0 +1,38 @@
+from io import BytesIO
+
+from django.conf import settings
+from rest_framework import exceptions, status
+from rest_framework.parsers import JSONParser
+
+
+class PayloadTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Слишком большой запрос.'
+    default_code = 'payload_too_large'
+
+
+class LimitedJSONParser(JSONParser):
+    """JSON-парсер, отклоняющий тело больше API_MAX_PAYLOAD_SIZE.
+
+    Заявленный CONTENT_LENGTH проверяется до чтения, а тело без длины
+    или длиннее заявленной читается не дальше лимита.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        limit = settings.API_MAX_PAYLOAD_SIZE
+        request = (parser_context or {}).get('request')
+        if request is not None:
+            try:
+                length = int(request.META.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                length = 0
+            if length > limit:
+                raise self.too_large(limit)
+        body = stream.read(limit + 1)
+        if len(body) > limit:
+            raise self.too_large(limit)
+        return super().parse(BytesIO(body), media_type, parser_context)
+
+    @staticmethod
+    def too_large(limit):
+        return PayloadTooLarge(f'Слишком большой запрос: больше {limit} байт.')
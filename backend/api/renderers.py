@@ -0,0 +1,117 @@
+import csv
+import json
+
+from rest_framework import renderers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LINE_SEPARATORS = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+
+class Echo:
+    """Псевдобуфер: csv.writer сразу отдаёт записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer на orjson с тем же результатом.
+
+    Без orjson, с отступами (Accept: ...; indent=N), ASCII-выводом или
+    данными, которые orjson не сериализует (например, целые больше 64 бит),
+    работает стандартный JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            body = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_NON_STR_KEYS
+                | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как в JSONRenderer: U+2028/U+2029 экранируются для <script>.
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in body:
+                body = body.replace(separator, escaped)
+        return body
+
+
+class ShoppingCartTextRenderer(renderers.BaseRenderer):
+    """Список покупок в виде текста."""
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode(self.charset)
+
+    def stream(self, ingredients):
+        yield 'Список покупок:\n'
+        for ingredient in ingredients:
+            yield (
+                f'{ingredient["name"]} '
+                f'{ingredient["total_amount"]} '
+                f'{ingredient["measurement_unit"]}\n'
+            )
+
+
+class ShoppingCartCSVRenderer(renderers.BaseRenderer):
+    """Список покупок в формате CSV."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict):
+            return str(data).encode(self.charset)
+        writer = csv.writer(Echo())
+        return ''.join(
+            writer.writerow((key, value)) for key, value in data.items()
+        ).encode(self.charset)
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('Ингредиент', 'Количество', 'Единица'))
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['name'],
+                ingredient['total_amount'],
+                ingredient['measurement_unit'],
+            ))
+
+
+class ShoppingCartJSONRenderer(FastJSONRenderer):
+    """Список покупок в формате JSON."""
+    charset = 'utf-8'
+
+    def stream(self, ingredients):
+        yield '['
+        separator = ''
+        for ingredient in ingredients:
+            yield separator + json.dumps({
+                'name': ingredient['name'],
+                'measurement_unit': ingredient['measurement_unit'],
+                'amount': ingredient['total_amount'],
+            }, ensure_ascii=False)
+            separator = ','
+        yield ']'
@@ -0,0 +1,134 @@
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from recipes.models import Recipe, RecipeIngredient
+
+RecipeTag = Recipe.tags.through
+
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit', 'amount')
+AUTHOR_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'is_subscribed',
+)
+RECIPE_FIELDS = (
+    'id', 'author_id', 'name', 'image', 'image_thumbnail', 'image_card',
+    'image_full', 'text', 'cooking_time', 'favorites_count',
+    'is_favorited', 'is_in_shopping_cart', 'pub_date',
+)
+RECIPE_MIN_FIELDS = ('id', 'name', 'image', 'image_thumbnail', 'cooking_time')
+FEED_ORDERING = (F('pub_date').desc(), F('id').desc())
+
+
+def image_url(request, name):
+    """Абсолютная ссылка на файл, как у ImageField сериализатора."""
+    if not name:
+        return None
+    url = default_storage.url(name)
+    if request is None:
+        return url
+    return request.build_absolute_uri(url)
+
+
+def related_querysets(recipes, authors):
+    """Теги, ингредиенты и авторы рецептов страницы - по одному SELECT.
+
+    Теги и ингредиенты - кортежи (recipe_id, *TAG_FIELDS) и
+    (recipe_id, *INGREDIENT_FIELDS); authors - queryset авторов с флагом
+    is_subscribed.
+    """
+    ids = [recipe['id'] for recipe in recipes]
+    return (
+        RecipeTag.objects.filter(recipe__in=ids).order_by(
+            'tag__name'
+        ).values_list(
+            'recipe_id', *(f'tag__{field}' for field in TAG_FIELDS)
+        ),
+        RecipeIngredient.objects.filter(recipe__in=ids).order_by(
+            'pk'
+        ).values_list(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount',
+        ),
+        authors.filter(
+            pk__in={recipe['author_id'] for recipe in recipes}
+        ).values(*AUTHOR_FIELDS),
+    )
+
+
+def group_by_first(rows, fields):
+    """Строки (ключ, *значения) - словарь {ключ: [dict(fields, значения)]}."""
+    grouped = defaultdict(list)
+    for recipe_id, *values in rows:
+        grouped[recipe_id].append(dict(zip(fields, values)))
+    return grouped
+
+
+def represent_recipes(request, recipes, tags, ingredients, authors,
+                      rendition):
+    """Рецепты в формате RecipeGetSerializer из строк values()."""
+    tags = group_by_first(tags, TAG_FIELDS)
+    ingredients = group_by_first(ingredients, INGREDIENT_FIELDS)
+    authors = {author['id']: author for author in authors}
+    return [
+        {
+            'id': recipe['id'],
+            'tags': tags.get(recipe['id'], []),
+            'author': authors[recipe['author_id']],
+            'ingredients': ingredients.get(recipe['id'], []),
+            'is_favorited': recipe['is_favorited'],
+            'is_in_shopping_cart': recipe['is_in_shopping_cart'],
+            'name': recipe['name'],
+            'image': image_url(
+                request, recipe[f'image_{rendition}'] or recipe['image']
+            ),
+            'text': recipe['text'],
+            'cooking_time': recipe['cooking_time'],
+            'favorites_count': recipe['favorites_count'],
+        }
+        for recipe in recipes
+    ]
+
+
+def represent_page(request, recipes, authors, rendition):
+    """represent_recipes с загрузкой тегов, ингредиентов и авторов."""
+    if not recipes:
+        return []
+    return represent_recipes(
+        request, recipes, *related_querysets(recipes, authors), rendition
+    )
+
+
+def represent_min_recipes(recipes, request=None):
+    """Рецепты в формате RecipeMinSerializer из строк values()."""
+    return [
+        {
+            'id': recipe['id'],
+            'name': recipe['name'],
+            'image': image_url(
+                request, recipe['image_thumbnail'] or recipe['image']
+            ),
+            'cooking_time': recipe['cooking_time'],
+        }
+        for recipe in recipes
+    ]
+
+
+def latest_recipes(authors, limit=None):
+    """Последние limit рецептов каждого автора одним SELECT.
+
+    Возвращает {author_id: [строки RECIPE_MIN_FIELDS]}.
+    """
+    queryset = Recipe.objects.filter(author__in=authors)
+    if limit is not None:
+        queryset = queryset.annotate(position=Window(
+            RowNumber(), partition_by=F('author'), order_by=FEED_ORDERING
+        )).filter(position__lte=limit)
+    return group_by_first(
+        queryset.order_by('author', *FEED_ORDERING).values_list(
+            'author_id', *RECIPE_MIN_FIELDS
+        ),
+        RECIPE_MIN_FIELDS,
+    )
@@ -0,0 +1,374 @@
+import heapq
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, TrigramSimilarity)
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import CharField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Concat, StrIndex
+
+from recipes.models import Recipe, RecipeIngredient
+
+from .constants import (CHUNK_SIZE, RECIPES_CACHE, SEARCH_CONFIG,
+                        SEARCH_INDEX_TTL, SEARCH_JOURNAL_LIMIT, SEARCH_LIMIT,
+                        TRIGRAM_THRESHOLD)
+
+WORD = re.compile(r'\w+')
+# Вес совпадения: название, ингредиенты, описание.
+WEIGHTS = {'A': 3, 'B': 2, 'C': 1}
+
+
+def tokenize(text):
+    return WORD.findall(text.lower())
+
+
+def is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def update_search_vectors(recipes):
+    """Пересчёт search_vector рецептов; для других СУБД ничего не делает."""
+    if not is_postgresql():
+        return
+    ingredients = Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    recipes.update(
+        search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector(
+                Coalesce(ingredients, Value('')),
+                weight='B',
+                config=SEARCH_CONFIG,
+            )
+            + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+        )
+    )
+
+
+def journal_key(position=None):
+    if position is None:
+        return f'api:{RECIPES_CACHE}:journal'
+    return f'api:{RECIPES_CACHE}:journal:{position}'
+
+
+def journal_position():
+    """Номер последней записи журнала изменений рецептов."""
+    position = cache.get(journal_key())
+    if position is None:
+        # Новая нумерация начинается дальше прежней, чтобы оставшиеся
+        # записи старого журнала не приняли за новые.
+        cache.add(journal_key(), time.time_ns() // 1000, None)
+        position = cache.get(journal_key(), 0)
+    return position
+
+
+def journal_recipes(ids):
+    """Записывает изменённые или удалённые рецепты в журнал.
+
+    По журналу индексы в памяти каждого процесса обновляют только эти
+    рецепты. Вызывается после коммита.
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    journal_position()
+    try:
+        position = cache.incr(journal_key())
+    except ValueError:
+        # Номер вытеснен из кеша: индексы и так перестроятся целиком.
+        return
+    cache.set(journal_key(position), ids, SEARCH_INDEX_TTL)
+
+
+def journal_changes(start, end):
+    """id рецептов из записей журнала после start до end включительно.
+
+    None - записей слишком много или часть недоступна: индекс
+    перестраивается целиком.
+    """
+    if start == end:
+        return set()
+    if not 0 < end - start <= SEARCH_JOURNAL_LIMIT:
+        return None
+    keys = [journal_key(position) for position in range(start + 1, end + 1)]
+    entries = cache.get_many(keys)
+    if len(entries) < len(keys):
+        return None
+    return set().union(*entries.values())
+
+
+def chunks(ids):
+    ids = sorted(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def filtered_ids(queryset):
+    """id рецептов queryset, если он отфильтрован, иначе None - все."""
+    if not queryset.query.has_filters():
+        return None
+    return set(
+        queryset.prefetch_related(None).order_by().values_list(
+            'pk', flat=True
+        )
+    )
+
+
+class RecipeIndex(ABC):
+    """Индекс рецептов в памяти процесса.
+
+    Строится из БД целиком при первом обращении и по истечении ttl, а
+    между ними обновляется только для рецептов из журнала изменений
+    (journal_recipes). Индекс меняется на месте, поэтому обращения к нему
+    идут под блокировкой (current()).
+    """
+
+    def __init__(self, ttl=SEARCH_INDEX_TTL):
+        self.ttl = ttl
+        self._position = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def reset(self):
+        """Пустой индекс."""
+
+    @abstractmethod
+    def add(self, recipe_ids=None):
+        """Добавляет рецепты recipe_ids, по умолчанию - все."""
+
+    @abstractmethod
+    def remove(self, recipe_ids):
+        """Удаляет рецепты recipe_ids."""
+
+    def refresh(self):
+        # Номер читается до БД: изменение, закоммиченное после чтения,
+        # попадёт в следующее обновление.
+        position = journal_position()
+        changed = None
+        if (
+            self._position is not None
+            and time.monotonic() - self._loaded_at <= self.ttl
+        ):
+            changed = journal_changes(self._position, position)
+        if changed is None:
+            self.reset()
+            self.add()
+            self._loaded_at = time.monotonic()
+        elif changed:
+            self.remove(changed)
+            self.add(changed)
+        self._position = position
+
+    @contextmanager
+    def current(self):
+        """Актуальный индекс на время блока."""
+        with self._lock:
+            self.refresh()
+            yield
+
+
+class RecipeSearchIndex(RecipeIndex):
+    """Инвертированный индекс слов рецептов.
+
+    Используется вместо полнотекстового поиска Postgres на других СУБД.
+    Слова хранятся отсортированными, поэтому слово запроса совпадает со
+    всеми словами, которые с него начинаются.
+    """
+
+    def reset(self):
+        self._words = []
+        self._postings = {}
+        self._recipe_words = defaultdict(set)
+
+    def add(self, recipe_ids=None):
+        new_words = set()
+
+        def add(recipe_id, text, weight):
+            for word in tokenize(text):
+                posting = self._postings.get(word)
+                if posting is None:
+                    posting = self._postings[word] = {}
+                    new_words.add(word)
+                posting[recipe_id] = max(
+                    posting.get(recipe_id, 0), WEIGHTS[weight]
+                )
+                self._recipe_words[recipe_id].add(word)
+
+        for recipes, items in self.querysets(recipe_ids):
+            for recipe_id, name, text in recipes.values_list(
+                'id', 'name', 'text'
+            ).iterator(chunk_size=CHUNK_SIZE):
+                add(recipe_id, name, 'A')
+                add(recipe_id, text, 'C')
+            for recipe_id, name in items.values_list(
+                'recipe_id', 'ingredient__name'
+            ).iterator(chunk_size=CHUNK_SIZE):
+                add(recipe_id, name, 'B')
+        if new_words:
+            self._words = list(heapq.merge(self._words, sorted(new_words)))
+
+    def remove(self, recipe_ids):
+        emptied = set()
+        for recipe_id in recipe_ids:
+            for word in self._recipe_words.pop(recipe_id, ()):
+                posting = self._postings[word]
+                del posting[recipe_id]
+                if not posting:
+                    del self._postings[word]
+                    emptied.add(word)
+        if emptied:
+            self._words = [
+                word for word in self._words if word not in emptied
+            ]
+
+    @staticmethod
+    def querysets(recipe_ids):
+        """Рецепты и их ингредиенты: все или частями по recipe_ids."""
+        if recipe_ids is None:
+            yield Recipe.objects.all(), RecipeIngredient.objects.all()
+            return
+        for chunk in chunks(recipe_ids):
+            yield (
+                Recipe.objects.filter(pk__in=chunk),
+                RecipeIngredient.objects.filter(recipe__in=chunk),
+            )
+
+    def search(self, query, allowed=None, limit=SEARCH_LIMIT):
+        """id рецептов, содержащих все слова запроса, по убыванию веса.
+
+        allowed - множество допустимых id (рецепты после фильтров) или
+        None; ограничение limit применяется после него.
+        """
+        with self.current():
+            scores = None
+            for token in set(tokenize(query)):
+                found = {}
+                start = bisect_left(self._words, token)
+                end = bisect_left(self._words, token + '\uffff', start)
+                for word in self._words[start:end]:
+                    for recipe_id, weight in self._postings[word].items():
+                        found[recipe_id] = max(
+                            found.get(recipe_id, 0), weight
+                        )
+                if scores is None:
+                    scores = found
+                else:
+                    scores = {
+                        recipe_id: score + found[recipe_id]
+                        for recipe_id, score in scores.items()
+                        if recipe_id in found
+                    }
+                if not scores:
+                    return []
+        if scores is None:
+            return []
+        if allowed is not None:
+            scores = {pk: scores[pk] for pk in scores.keys() & allowed}
+        return heapq.nsmallest(
+            limit, scores, key=lambda pk: (-scores[pk], -pk)
+        )
+
+
+class IngredientRecipeIndex(RecipeIndex):
+    """Инвертированный индекс «ингредиент -> рецепты».
+
+    Хранит и ингредиенты каждого рецепта, поэтому покрытие считается
+    без GROUP BY по RecipeIngredient.
+    """
+
+    def reset(self):
+        self._postings = defaultdict(set)
+        self._recipe_ingredients = defaultdict(set)
+
+    def add(self, recipe_ids=None):
+        items = [RecipeIngredient.objects.all()] if recipe_ids is None else (
+            RecipeIngredient.objects.filter(recipe__in=chunk)
+            for chunk in chunks(recipe_ids)
+        )
+        for queryset in items:
+            for ingredient_id, recipe_id in queryset.values_list(
+                'ingredient_id', 'recipe_id'
+            ).iterator(chunk_size=CHUNK_SIZE):
+                self._postings[ingredient_id].add(recipe_id)
+                self._recipe_ingredients[recipe_id].add(ingredient_id)
+
+    def remove(self, recipe_ids):
+        for recipe_id in recipe_ids:
+            for ingredient_id in self._recipe_ingredients.pop(recipe_id, ()):
+                self._postings[ingredient_id].discard(recipe_id)
+
+    def search(self, ingredients, max_missing=None, allowed=None,
+               limit=SEARCH_LIMIT):
+        """id рецептов по убыванию доли имеющихся ингредиентов.
+
+        При равной доле выше рецепт, которому не хватает меньшего числа
+        ингредиентов. allowed - как в RecipeSearchIndex.search.
+        """
+        with self.current():
+            found = Counter()
+            for ingredient_id in set(ingredients):
+                found.update(self._postings.get(ingredient_id, ()))
+            sizes = {
+                pk: len(self._recipe_ingredients[pk]) for pk in found
+            }
+        ranked = (
+            (-count / sizes[pk], sizes[pk] - count, -pk)
+            for pk, count in found.items()
+            if (max_missing is None or sizes[pk] - count <= max_missing)
+            and (allowed is None or pk in allowed)
+        )
+        return [-pk for *_, pk in heapq.nsmallest(limit, ranked)]
+
+
+recipe_index = RecipeSearchIndex()
+cookable_index = IngredientRecipeIndex()
+
+
+def filter_ranked(queryset, ids):
+    """Рецепты queryset из списка ids в порядке этого списка."""
+    # Порядок - позиция ',id,' в строке ранжированных id: одно
+    # выражение вместо CASE на сотни веток.
+    ranked = Value(f',{",".join(map(str, ids))},')
+    return queryset.filter(pk__in=ids).order_by(StrIndex(
+        ranked,
+        Concat(Value(','), Cast('pk', CharField()), Value(',')),
+    ))
+
+
+def search_recipes(queryset, query):
+    """Рецепты queryset, подходящие под query, по убыванию релевантности.
+
+    В Postgres - полнотекстовый поиск по search_vector, а если он ничего
+    не нашёл, то по триграммному сходству названия.
+    """
+    if not is_postgresql():
+        return filter_ranked(
+            queryset, recipe_index.search(query, filtered_ids(queryset))
+        )
+    search_query = SearchQuery(
+        query, config=SEARCH_CONFIG, search_type='websearch'
+    )
+    found = queryset.filter(search_vector=search_query)
+    if found.exists():
+        return found.annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-id')
+    return queryset.annotate(
+        similarity=TrigramSimilarity('name', query)
+    ).filter(
+        similarity__gt=TRIGRAM_THRESHOLD
+    ).order_by('-similarity', '-id')
@@ -1,13 +1,54 @@
-from django.db import models
+from collections import Counter
+
+from django.db import models, transaction
 from djoser.serializers import UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import exceptions, fields, serializers
 from rest_framework.validators import UniqueTogetherValidator
 
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
 from users.models import Subscribe, User
-from .constants import VALID_MAX, VALID_MIN
+from .constants import IMAGE_MAX_SIDE, VALID_MAX, VALID_MIN
+from .fields import RenditionField, StreamingBase64ImageField
+from .representations import RECIPE_MIN_FIELDS, represent_min_recipes
+from .viewer import get_viewer_state
+
+
+def join_ids(ids):
+    return ', '.join(map(str, ids))
+
+
+def get_non_negative_int(request, name):
+    """Параметр запроса name: неотрицательное целое или None."""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise exceptions.ValidationError({
+            name: 'Нужно неотрицательное целое число!'
+        })
+    return value
+
+
+def get_recipes_limit(request):
+    return get_non_negative_int(request, 'recipes_limit')
+
+
+def get_ids(request, name):
+    """Множество id из повторяющегося параметра или списка через запятую."""
+    try:
+        return {
+            int(part)
+            for value in request.query_params.getlist(name)
+            for part in value.split(',')
+            if part.strip()
+        }
+    except ValueError:
+        raise exceptions.ValidationError({name: 'Нужен список целых id!'})
 
 
 class CustomUserSerializer(UserSerializer):
@@ -24,35 +65,30 @@ class CustomUserSerializer(UserSerializer):
         model = User
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        return (
-            user.is_authenticated
-            and obj.subscribing.filter(user=user).exists()
-        )
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return get_viewer_state(self.context).is_subscribed(obj.pk)
 
 
 class SubscribeSerializer(CustomUserSerializer):
     """Сериализатор подписки."""
-    recipes_count = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
 
     class Meta(CustomUserSerializer.Meta):
         fields = CustomUserSerializer.Meta.fields + (
-            'recipes_count', 'recipes'
+            'recipes_count', 'subscribers_count', 'recipes'
         )
         read_only_fields = ('email', 'username')
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if limit:
-            recipes = recipes[:int(limit)]
-        serializer = RecipeMinSerializer(recipes, many=True, read_only=True)
-        return serializer.data
+        if hasattr(obj, 'feed_recipes'):
+            recipes = obj.feed_recipes
+        else:
+            limit = get_recipes_limit(self.context.get('request'))
+            recipes = obj.recipes.order_by('-pub_date', '-id').values(
+                *RECIPE_MIN_FIELDS
+            )[:limit]
+        return represent_min_recipes(recipes)
 
 
 class SubscribeUpdateSerializer(serializers.ModelSerializer):
@@ -110,7 +146,7 @@ class RecipeGetSerializer(serializers.ModelSerializer):
     """Сериализатор чтения рецепта."""
     tags = TagSerializer(many=True)
     ingredients = serializers.SerializerMethodField()
-    image = Base64ImageField()
+    image = RenditionField('full', list_rendition='card')
     author = CustomUserSerializer(read_only=True)
     is_favorited = fields.SerializerMethodField(read_only=True)
     is_in_shopping_cart = fields.SerializerMethodField(read_only=True)
@@ -121,39 +157,30 @@ class RecipeGetSerializer(serializers.ModelSerializer):
             'ingredients', 'is_favorited',
             'is_in_shopping_cart',
             'name', 'image', 'text',
-            'cooking_time',
+            'cooking_time', 'favorites_count',
         )
         model = Recipe
 
     def get_ingredients(self, obj):
-        recipe = obj
-        ingredients = recipe.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=models.F('recipeingredient__amount')
-        )
-        return ingredients
+        return [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in obj.ingredient_list.all()
+        ]
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        return (
-            request is not None
-            and request.user.is_authenticated
-            and Favorite.objects.filter(
-                user=request.user, recipe=obj
-            ).exists()
-        )
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return get_viewer_state(self.context).is_favorited(obj.pk)
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        return (
-            request is not None
-            and request.user.is_authenticated
-            and ShoppingCart.objects.filter(
-                user=request.user, recipe=obj
-            ).exists()
-        )
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return get_viewer_state(self.context).is_in_shopping_cart(obj.pk)
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -162,7 +189,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True
     )
-    image = Base64ImageField(use_url=True)
+    image = StreamingBase64ImageField(use_url=True)
     author = CustomUserSerializer(read_only=True)
 
     class Meta:
@@ -181,26 +208,29 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise exceptions.ValidationError({
                 'ingredients': 'Нужен хотя бы один ингредиент!'
             })
-        ingredients_list = []
+        ids = Counter(ingredient['id'] for ingredient in ingredients)
+        found = Ingredient.objects.in_bulk(ids)
+        unknown = sorted(ids.keys() - found.keys())
+        duplicates = sorted(pk for pk, count in ids.items() if count > 1)
+        errors = []
+        if unknown:
+            errors.append(
+                f'Таких ингредиентов нет в базе: {join_ids(unknown)}!'
+            )
+        if duplicates:
+            errors.append(
+                f'Ингридиенты не могут повторяться: {join_ids(duplicates)}!'
+            )
+        if errors:
+            raise exceptions.ValidationError({'ingredients': errors})
+        if any(int(ingredient['amount']) < VALID_MIN
+               for ingredient in ingredients):
+            raise exceptions.ValidationError({
+                'amount':
+                f'Количество ингредиента не может быть меньше {VALID_MIN}!'
+            })
         for ingredient in ingredients:
-            try:
-                current_ingredient = Ingredient.objects.get(
-                    id=ingredient['id']
-                )
-            except Ingredient.DoesNotExist:
-                raise exceptions.ValidationError({
-                    'ingredients': 'Такого ингредиента нет в базе!'
-                })
-            if current_ingredient in ingredients_list:
-                raise exceptions.ValidationError({
-                    'ingredients': 'Ингридиенты не могут повторяться!'
-                })
-            if int(ingredient['amount']) < VALID_MIN:
-                raise exceptions.ValidationError({
-                    'amount':
-                    f'Количество ингредиента не может быть меньше {VALID_MIN}!'
-                })
-            ingredients_list.append(current_ingredient)
+            ingredient['ingredient'] = found[ingredient['id']]
         if 'tags' not in attrs.keys():
             raise exceptions.ValidationError(
                 {'tags': 'Отсутствует поле "Теги"!'},
@@ -212,6 +242,11 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise exceptions.ValidationError(
                 {'image': 'Нужна фотография рецепта'}
             )
+        image = getattr(value, 'image', None)
+        if image is not None and max(image.size) > IMAGE_MAX_SIDE:
+            raise exceptions.ValidationError(
+                {'image': f'Сторона изображения больше {IMAGE_MAX_SIDE} px!'}
+            )
         return value
 
     def validate_cooking_time(self, value):
@@ -231,15 +266,22 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise exceptions.ValidationError(
                 {'tags': 'Нужно выбрать хотя бы один тег!'}
             )
-        tags_list = []
-        for tag in value:
-            if tag in tags_list:
-                raise exceptions.ValidationError({
-                    'tags': 'Такой тег уже есть!'
-                })
-            tags_list.append(tag)
+        if len(set(value)) != len(value):
+            raise exceptions.ValidationError({
+                'tags': 'Такой тег уже есть!'
+            })
         return value
 
+    def save(self, **kwargs):
+        """Сохранение; временный файл изображения закрывается в конце."""
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
+
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
@@ -254,34 +296,81 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     def create_ingredients_amounts(self, ingredients, recipe):
         RecipeIngredient.objects.bulk_create(
             RecipeIngredient(
-                ingredient=Ingredient.objects.get(id=ingredient['id']),
+                ingredient=ingredient['ingredient'],
                 recipe=recipe,
                 amount=ingredient['amount']
             ) for ingredient in ingredients
         )
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        """Обновление рецепта: пишутся только изменившиеся данные."""
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        instance = super().update(instance, validated_data)
-        instance.tags.clear()
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.create_ingredients_amounts(
-            recipe=instance, ingredients=ingredients
+        saved = any(
+            getattr(instance, field) != value
+            for field, value in validated_data.items()
         )
-        instance.save()
+        if saved:
+            instance = super().update(instance, validated_data)
+        changed = False
+
+        if {tag.pk for tag in instance.tags.all()} != {tag.pk for tag in tags}:
+            instance.tags.set(tags)
+            changed = True
+
+        existing = {
+            item.ingredient_id: item for item in instance.ingredient_list.all()
+        }
+        old_amounts = {pk: item.amount for pk, item in existing.items()}
+        new_amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        if old_amounts != new_amounts:
+            RecipeIngredient.objects.filter(
+                recipe=instance,
+                ingredient__in=old_amounts.keys() - new_amounts.keys(),
+            ).delete()
+            self.create_ingredients_amounts(
+                recipe=instance,
+                ingredients=[
+                    ingredient for ingredient in ingredients
+                    if ingredient['id'] not in existing
+                ],
+            )
+            updated = []
+            for pk, item in existing.items():
+                if pk in new_amounts and item.amount != new_amounts[pk]:
+                    item.amount = new_amounts[pk]
+                    updated.append(item)
+            RecipeIngredient.objects.bulk_update(updated, ('amount',))
+            ShoppingListItem.objects.recipe_changed(
+                instance, old_amounts, new_amounts
+            )
+            changed = True
+
+        if changed and not saved:
+            instance.save(update_fields=('updated_at',))
         return instance
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        models.prefetch_related_objects(
+            [instance],
+            'tags',
+            models.Prefetch(
+                'ingredient_list',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
         return RecipeGetSerializer(instance, context=context).data
 
 
 class RecipeMinSerializer(serializers.ModelSerializer):
     """Сериализатор рецепта мини."""
-    image = Base64ImageField()
+    image = RenditionField('thumbnail')
 
     class Meta:
         model = Recipe
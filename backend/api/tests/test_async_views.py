@@ -0,0 +1,102 @@
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import AsyncClient, Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from api import async_views
+from recipes.models import Favorite, ShoppingCart
+from recipes.tests.base import FoodgramTestCase
+
+
+async def aget(url, headers):
+    return await AsyncClient().get(url, headers=headers)
+
+
+class AsyncViewsParityTest(FoodgramTestCase):
+    """Асинхронные вьюхи (ASGI) отвечают так же, как вьюсеты DRF (WSGI)."""
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user('author')
+        self.reader = self.create_user('reader')
+        self.lunch = self.create_tag('lunch')
+        self.dinner = self.create_tag('dinner')
+        salt = self.create_ingredient('соль')
+        sugar = self.create_ingredient('сахар')
+        self.recipes = [
+            self.create_recipe(
+                self.author, {salt: index + 1}, tags, name=f'Рецепт {index}'
+            )
+            for index, tags in enumerate((
+                [self.lunch], [self.dinner], [self.lunch, self.dinner],
+                [], [self.lunch], [self.dinner], [self.lunch],
+            ))
+        ]
+        self.create_recipe(self.reader, {sugar: 3}, [self.lunch])
+        Favorite.objects.create(user=self.reader, recipe=self.recipes[2])
+        ShoppingCart.objects.create(user=self.reader, recipe=self.recipes[2])
+        ShoppingCart.objects.create(user=self.reader, recipe=self.recipes[4])
+        self.headers = {
+            'Authorization':
+                f'Token {Token.objects.create(user=self.reader).key}'
+        }
+
+    def get(self, url, headers):
+        """Ответы WSGI и ASGI; второй - с числом передач вьюсету DRF."""
+        cache.clear()
+        sync = Client().get(url, headers=headers)
+        cache.clear()
+        patcher = mock.patch.object(
+            async_views, 'sync_view', wraps=async_views.sync_view
+        )
+        with override_settings(ROOT_URLCONF='foodgram.urls_asgi'), \
+                patcher as sync_view:
+            response = async_to_sync(aget)(url, headers)
+        return sync, response, sync_view.await_count
+
+    def assertParity(self, urls, fallback=False):
+        for headers in ({}, self.headers):
+            for url in urls:
+                with self.subTest(url=url, authenticated=bool(headers)):
+                    sync, response, fallbacks = self.get(url, headers)
+                    self.assertEqual(response.status_code, sync.status_code)
+                    self.assertEqual(
+                        json.loads(response.content), json.loads(sync.content)
+                    )
+                    self.assertEqual(fallbacks, int(fallback))
+
+    def test_recipes(self):
+        author, recipe = self.author.pk, self.recipes[0].pk
+        self.assertParity((
+            '/api/recipes/',
+            '/api/recipes/?limit=3&page=2',
+            '/api/recipes/?limit=3&page=last',
+            '/api/recipes/?tags=lunch',
+            '/api/recipes/?tags=lunch&tags=dinner&tags_mode=all',
+            '/api/recipes/?tags=lunch&tags=dinner&tags_mode=any',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=true&limit=1',
+            '/api/recipes/?is_favorited=false',
+            '/api/recipes/?is_favorited=maybe',
+            f'/api/recipes/?author={author}&ordering=popular',
+            f'/api/recipes/{recipe}/',
+            '/api/tags/',
+            f'/api/tags/{self.lunch.pk}/',
+            '/api/ingredients/?name=с',
+        ))
+
+    def test_errors(self):
+        """Ошибки строит вьюсет DRF, ответы совпадают."""
+        self.assertParity((
+            '/api/recipes/?author=999999',
+            '/api/recipes/?author=abc',
+            '/api/recipes/?page=9',
+            '/api/recipes/?page=abc',
+            '/api/recipes/?tags=missing',
+            '/api/recipes/?tags_mode=none',
+            '/api/recipes/?ordering=oldest',
+            '/api/recipes/999999/',
+        ), fallback=True)
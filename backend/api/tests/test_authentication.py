@@ -0,0 +1,68 @@
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+from recipes.tests.base import FoodgramTestCase
+
+PASSWORD = 'Foodgram-test-123'
+
+
+class TokenCacheTest(FoodgramTestCase):
+    """Кеш токенов: сброс при выходе и деактивации, свежие счётчики."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('cook')
+        self.client = APIClient()
+        response = self.client.post('/api/auth/token/login/', {
+            'email': self.user.email, 'password': PASSWORD,
+        })
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}'
+        )
+
+    def get_me(self):
+        return self.client.get('/api/users/me/')
+
+    def test_cached_token(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        hits = token_cache.hits
+        self.assertEqual(self.get_me().status_code, 200)
+        self.assertEqual(token_cache.hits, hits + 1)
+
+    def test_logout(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        with self.commit():
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_deactivation(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        self.user.is_active = False
+        with self.commit():
+            self.user.save()
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_cached_user_is_not_written_back(self):
+        """set_password сохраняет закешированного request.user.
+
+        Счётчик рецептов и last_login после повторного входа меняются
+        без смены версии токенов и не должны откатиться.
+        """
+        self.assertEqual(self.get_me().status_code, 200)
+        self.create_recipe(self.user)
+        APIClient().post('/api/auth/token/login/', {
+            'email': self.user.email, 'password': PASSWORD,
+        })
+        self.user.refresh_from_db()
+        last_login = self.user.last_login
+        with self.commit():
+            response = self.client.post('/api/auth/users/set_password/', {
+                'current_password': PASSWORD,
+                'new_password': 'Foodgram-new-456',
+            })
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.recipes_count, 1)
+        self.assertEqual(self.user.last_login, last_login)
+        self.assertTrue(self.user.check_password('Foodgram-new-456'))
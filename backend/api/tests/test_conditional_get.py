@@ -0,0 +1,95 @@
+from rest_framework.test import APIClient
+
+from recipes.models import ShoppingCart
+from recipes.tests.base import FoodgramTestCase
+from users.models import Subscribe
+
+
+class ConditionalGetTest(FoodgramTestCase):
+    """ETag списка и страницы рецепта меняется вместе с их содержимым."""
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user('author')
+        self.reader = self.create_user('reader')
+        self.other = self.create_user('other')
+        self.tag = self.create_tag('lunch')
+        self.dinner = self.create_tag('dinner')
+        self.salt = self.create_ingredient('соль')
+        self.recipe = self.create_recipe(
+            self.author, {self.salt: 5}, [self.tag]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+        self.urls = ('/api/recipes/', f'/api/recipes/{self.recipe.pk}/')
+
+    def etags(self):
+        """ETag маршрутов, заодно проверяется ответ 304 на них."""
+        etags = []
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+            self.assertEqual(
+                self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                304,
+            )
+            etags.append(etag)
+        return etags
+
+    def assertChanges(self, change, changed=True):
+        etags = self.etags()
+        with self.commit():
+            change()
+        for url, etag in zip(self.urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200 if changed else 304)
+
+    def test_author_edit(self):
+        def change():
+            self.author.first_name = 'Другое имя'
+            self.author.save()
+
+        self.assertChanges(change)
+        response = self.client.get(self.urls[1])
+        self.assertEqual(response.data['author']['first_name'], 'Другое имя')
+
+    def test_subscribe(self):
+        self.assertChanges(lambda: Subscribe.objects.create(
+            user=self.reader, author=self.author
+        ))
+        self.assertTrue(
+            self.client.get(self.urls[1]).data['author']['is_subscribed']
+        )
+
+    def test_tags_change(self):
+        self.assertChanges(lambda: self.recipe.tags.add(self.dinner))
+
+    def test_ingredient_rename(self):
+        def change():
+            self.salt.name = 'морская соль'
+            self.salt.save()
+
+        self.assertChanges(change)
+        response = self.client.get(self.urls[1])
+        self.assertEqual(
+            response.data['ingredients'][0]['name'], 'морская соль'
+        )
+
+    def test_recipe_delete(self):
+        self.urls = self.urls[:1]
+        self.assertChanges(self.recipe.delete)
+
+    def test_other_user_cart(self):
+        """Корзина другого пользователя ETag читателя не меняет."""
+        self.assertChanges(
+            lambda: ShoppingCart.objects.create(
+                user=self.other, recipe=self.recipe
+            ),
+            changed=False,
+        )
+
+    def test_own_cart(self):
+        self.assertChanges(lambda: ShoppingCart.objects.create(
+            user=self.reader, recipe=self.recipe
+        ))
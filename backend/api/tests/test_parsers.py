@@ -0,0 +1,44 @@
+from io import BytesIO
+
+from django.test import override_settings
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.parsers import LimitedJSONParser, PayloadTooLarge
+from recipes.tests.base import FoodgramTestCase
+
+
+@override_settings(API_MAX_PAYLOAD_SIZE=16)
+class LimitedJSONParserTest(FoodgramTestCase):
+    """Лимит тела JSON: по заявленной длине и при чтении."""
+
+    @staticmethod
+    def parse(stream, **meta):
+        request = APIRequestFactory().post('/')
+        request.META.pop('CONTENT_LENGTH', None)
+        request.META.update(meta)
+        return LimitedJSONParser().parse(
+            stream, parser_context={'request': request}
+        )
+
+    def test_small_body(self):
+        self.assertEqual(self.parse(BytesIO(b'{"a": 1}')), {'a': 1})
+
+    def test_declared_length(self):
+        with self.assertRaises(PayloadTooLarge) as error:
+            self.parse(BytesIO(b'{}'), CONTENT_LENGTH='17')
+        self.assertEqual(error.exception.status_code, 413)
+
+    def test_body_without_length(self):
+        """Тело без CONTENT_LENGTH (chunked) читается не дальше лимита."""
+        stream = BytesIO(b'{"a": "' + b'x' * 100 + b'"}')
+        with self.assertRaises(PayloadTooLarge):
+            self.parse(stream)
+        self.assertEqual(stream.tell(), 17)
+
+    def test_api_response(self):
+        client = APIClient()
+        client.force_authenticate(self.create_user('cook'))
+        response = client.post(
+            '/api/recipes/', {'name': 'x' * 100}, format='json'
+        )
+        self.assertEqual(response.status_code, 413)
@@ -0,0 +1,68 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, RecipeIngredient
+from recipes.tests.base import FoodgramTestCase
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class RecipeUpdateTest(FoodgramTestCase):
+    """Обновление рецепта пишет только изменившиеся данные."""
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user('author')
+        self.tag = self.create_tag('lunch')
+        self.salt = self.create_ingredient('соль')
+        self.flour = self.create_ingredient('мука')
+        self.recipe = self.create_recipe(
+            self.author, {self.salt: 5, self.flour: 100}, [self.tag]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def patch(self, **data):
+        payload = {
+            'name': self.recipe.name,
+            'tags': [self.tag.pk],
+            'ingredients': [
+                {'id': self.salt.pk, 'amount': 5},
+                {'id': self.flour.pk, 'amount': 100},
+            ],
+            **data,
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/', payload, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in queries
+            if query['sql'].lstrip().upper().startswith(WRITES)
+        ]
+
+    def test_noop_patch(self):
+        updated_at = self.recipe.updated_at
+        self.assertEqual(self.patch(), [])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.updated_at, updated_at)
+
+    def test_amount_change(self):
+        writes = self.patch(ingredients=[
+            {'id': self.salt.pk, 'amount': 6},
+            {'id': self.flour.pk, 'amount': 100},
+        ])
+        self.assertTrue(writes)
+        self.assertFalse(any('recipes_recipe_tags' in sql for sql in writes))
+        self.assertEqual(
+            dict(RecipeIngredient.objects.filter(
+                recipe=self.recipe
+            ).values_list('ingredient_id', 'amount')),
+            {self.salt.pk: 6, self.flour.pk: 100},
+        )
+        self.assertGreater(
+            Recipe.objects.get(pk=self.recipe.pk).updated_at,
+            self.recipe.updated_at,
+        )
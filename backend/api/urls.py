@@ -3,6 +3,7 @@ from django.conf.urls.static import static
 from django.urls import include, path
 from rest_framework import routers
 
+from . import async_views
 from .views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
                     TagViewSet)
 
@@ -18,6 +19,16 @@ urlpatterns = [
     path('', include(router.urls)),
 ]
 
+# Асинхронные вьюхи чтения; подключаются только в foodgram.asgi.
+async_urlpatterns = [
+    path('tags/', async_views.tag_list),
+    path('tags/<int:pk>/', async_views.tag_detail),
+    path('ingredients/', async_views.ingredient_list),
+    path('ingredients/<int:pk>/', async_views.ingredient_detail),
+    path('recipes/', async_views.recipe_list),
+    path('recipes/<int:pk>/', async_views.recipe_detail),
+]
+
 if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
@@ -0,0 +1,79 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscribe
+
+from .caching import bump_version
+from .constants import VIEWER_STATE_TTL
+
+# Набор id пользователя: модель связи и поле с id объекта.
+STATES = {
+    'favorites': (Favorite, 'recipe_id'),
+    'shopping_cart': (ShoppingCart, 'recipe_id'),
+    'subscriptions': (Subscribe, 'author_id'),
+}
+
+
+def state_key(user_id, name):
+    return f'api:viewer:{user_id}:{name}'
+
+
+def state_namespace(user_id, name):
+    """Пространство версии набора id пользователя для ETag рецептов."""
+    return f'viewer:{user_id}:{name}'
+
+
+def reset_viewer_state(user_id, name):
+    """Сброс закешированного набора id пользователя после изменения."""
+    cache.delete(state_key(user_id, name))
+    bump_version(state_namespace(user_id, name))
+
+
+class ViewerState:
+    """Избранное, корзина и подписки текущего пользователя.
+
+    Каждый набор id загружается при первом обращении одним запросом
+    и кешируется на VIEWER_STATE_TTL; сигналы сбрасывают кеш при
+    изменении связей.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._sets = {}
+
+    def get(self, name):
+        if not self.user.is_authenticated:
+            return frozenset()
+        ids = self._sets.get(name)
+        if ids is None:
+            key = state_key(self.user.pk, name)
+            ids = cache.get(key)
+            if ids is None:
+                model, field = STATES[name]
+                ids = frozenset(model.objects.filter(
+                    user=self.user
+                ).values_list(field, flat=True))
+                cache.set(key, ids, VIEWER_STATE_TTL)
+            self._sets[name] = ids
+        return ids
+
+    def is_favorited(self, recipe_id):
+        return recipe_id in self.get('favorites')
+
+    def is_in_shopping_cart(self, recipe_id):
+        return recipe_id in self.get('shopping_cart')
+
+    def is_subscribed(self, author_id):
+        return author_id in self.get('subscriptions')
+
+
+def get_viewer_state(context):
+    """Состояние пользователя, общее для всех сериализаторов запроса."""
+    request = context.get('request')
+    if request is None:
+        return ViewerState(AnonymousUser())
+    state = getattr(request, 'viewer_state', None)
+    if state is None or state.user != request.user:
+        state = request.viewer_state = ViewerState(request.user)
+    return state
@@ -1,22 +1,41 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+import hashlib
+import time
+
+from django.db.models import Exists, F, OuterRef, Prefetch, Value
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser import views
-from rest_framework import permissions, status, viewsets
+from rest_framework import (exceptions, generics, permissions, status,
+                            viewsets)
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from api.filters import IngredientFilter, RecipeFilter
+from api.autocomplete import FIELDS as INGREDIENT_FIELDS
+from api.autocomplete import ingredient_index
+from api.caching import (CachedResponseMixin, conditional_response,
+                         get_versions)
+from api.constants import (CHUNK_SIZE, INGREDIENTS_CACHE, INGREDIENTS_LIMIT,
+                           RECIPES_CACHE, TAGS_CACHE)
+from api.filters import POPULAR_ORDERING, RecipeFilter
 from api.pagination import CustomPaginator
 from api.permissions import IsAuthorOrReadOnly
+from api.renderers import (ShoppingCartCSVRenderer, ShoppingCartJSONRenderer,
+                           ShoppingCartTextRenderer)
+from api.representations import (RECIPE_FIELDS, TAG_FIELDS, latest_recipes,
+                                 represent_page)
+from api.search import (cookable_index, filter_ranked, filtered_ids,
+                        search_recipes)
 from api.serializers import (CustomUserSerializer, FavoriteRecipeSerializer,
                              IngredientSerializer, RecipeCreateSerializer,
                              RecipeGetSerializer, ShoppingCartSerializer,
                              SubscribeSerializer, SubscribeUpdateSerializer,
-                             TagSerializer)
+                             TagSerializer, get_ids, get_non_negative_int,
+                             get_recipes_limit)
+from api.viewer import STATES, state_namespace
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
 from users.models import Subscribe, User
 
 
@@ -25,6 +44,7 @@ class CustomUserViewSet(views.UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = CustomPaginator
+    cursor_ordering = 'id'
 
     def get_permissions(self):
         if self.action == 'me':
@@ -36,11 +56,17 @@ class CustomUserViewSet(views.UserViewSet):
         permission_classes=[permissions.IsAuthenticated]
     )
     def subscriptions(self, request):
-        """Подписка."""
+        """Подписки с последними рецептами авторов."""
+        limit = get_recipes_limit(request)
         subscriptions = User.objects.filter(
             subscribing__user=request.user
+        ).annotate(
+            is_subscribed=Value(True),
         )
         page = self.paginate_queryset(subscriptions)
+        feed = latest_recipes(page, limit)
+        for author in page:
+            author.feed_recipes = feed.get(author.pk, [])
         serializer = SubscribeSerializer(
             page,
             context={'request': request},
@@ -65,7 +91,9 @@ class CustomUserViewSet(views.UserViewSet):
             context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        subscription = serializer.save()
+        # Автор загружен до того, как сигнал увеличил его счётчик.
+        subscription.author.refresh_from_db(fields=['subscribers_count'])
         return Response(
             serializer.data, status=status.HTTP_201_CREATED
         )
@@ -87,36 +115,233 @@ class CustomUserViewSet(views.UserViewSet):
         )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class ValuesReadMixin:
+    """list/retrieve из строк values() без полей сериализатора.
+
+    values_fields повторяют поля serializer_class, который остаётся
+    для схемы и браузерного API.
+    """
+    values_fields = None
+
+    def get_values(self):
+        return self.filter_queryset(self.get_queryset()).values(
+            *self.values_fields
+        )
+
+    def list(self, request, *args, **kwargs):
+        return Response(list(self.get_values()))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        return Response(generics.get_object_or_404(
+            self.get_values(), **{self.lookup_field: kwargs[lookup]}
+        ))
+
+
+class TagViewSet(CachedResponseMixin, ValuesReadMixin,
+                 viewsets.ReadOnlyModelViewSet):
     """Вьюсет тега."""
+    cache_namespace = TAGS_CACHE
+    values_fields = TAG_FIELDS
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedResponseMixin, ValuesReadMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Вьюсет ингредиента."""
+    cache_namespace = INGREDIENTS_CACHE
+    values_fields = INGREDIENT_FIELDS
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientFilter
-    search_fields = ('name',)
 
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(self.search, request)
+
+    def search(self, request):
+        """Автодополнение по названию из индекса в памяти."""
+        name = request.query_params.get('name', '')
+        return Response(ingredient_index.search(
+            name, INGREDIENTS_LIMIT if name else None
+        ))
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Вьюсет рецепта."""
     queryset = Recipe.objects.all()
     pagination_class = CustomPaginator
+    cursor_ordering = ('-pub_date', '-id')
     permission_classes = [
         IsAuthorOrReadOnly, permissions.IsAuthenticatedOrReadOnly
     ]
     filter_backends = (DjangoFilterBackend,)
-    search_fields = ('name',)
     filterset_class = RecipeFilter
-    ordering = ('-pub_date',)
+
+    def get_queryset(self):
+        """Рецепты с заранее вычисленными полями для сериализатора."""
+        user = self.request.user
+        return self.annotated(user).prefetch_related(
+            Prefetch('author', queryset=self.authors(user)),
+            'tags',
+            Prefetch(
+                'ingredient_list',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+    @classmethod
+    def annotated(cls, user):
+        """Рецепты с флагами избранного и корзины пользователя."""
+        return Recipe.objects.annotate(
+            is_favorited=cls.exists(Favorite, user),
+            is_in_shopping_cart=cls.exists(ShoppingCart, user),
+        )
+
+    @classmethod
+    def authors(cls, user):
+        """Авторы с флагом подписки пользователя."""
+        return User.objects.annotate(is_subscribed=cls.subscribed(user, 'pk'))
+
+    @staticmethod
+    def exists(model, user):
+        """Рецепт в избранном или корзине пользователя."""
+        if not user.is_authenticated:
+            return Value(False)
+        return Exists(model.objects.filter(user=user, recipe=OuterRef('pk')))
+
+    @staticmethod
+    def subscribed(user, author):
+        """Пользователь подписан на автора."""
+        if not user.is_authenticated:
+            return Value(False)
+        return Exists(
+            Subscribe.objects.filter(user=user, author=OuterRef(author))
+        )
+
+    def get_cursor_ordering(self):
+        """Порядок выдачи для пагинации по ключу.
+
+        У поиска и подбора порядок - по релевантности, которую нельзя
+        продолжить курсором, поэтому cursor там не поддерживается.
+        """
+        if self.action in ('search', 'cookable'):
+            raise exceptions.ValidationError({
+                'cursor': 'Пагинация по ключу недоступна для ранжированной '
+                          'выдачи, используйте page и limit.'
+            })
+        if self.request.query_params.get('ordering') == 'popular':
+            return POPULAR_ORDERING
+        return self.cursor_ordering
+
+    def get_validator(self):
+        """ETag и время изменения для условного GET.
+
+        Строятся из версий, которые сигналы меняют после коммита: рецептов
+        с авторами и счётчиками, справочников тегов и ингредиентов,
+        избранного, корзины и подписок пользователя. Запросов к базе
+        и сериализации при этом нет.
+        """
+        return self.make_validator(
+            self.request,
+            self.request.accepted_media_type,
+            get_versions(*self.validator_namespaces(self.request.user)),
+        )
+
+    @staticmethod
+    def validator_namespaces(user):
+        """Пространства версий, от которых зависит ответ пользователю."""
+        namespaces = [RECIPES_CACHE, TAGS_CACHE, INGREDIENTS_CACHE]
+        if user.is_authenticated:
+            namespaces += [state_namespace(user.pk, name) for name in STATES]
+        return namespaces
+
+    @staticmethod
+    def make_validator(request, media_type, versions):
+        etag = hashlib.md5(':'.join(map(str, (
+            request.get_full_path(),
+            media_type,
+            request.user.pk,
+            *versions,
+        ))).encode()).hexdigest()
+        last_modified = None
+        if not request.user.is_authenticated:
+            # Last-Modified с точностью до секунды отдаётся, только когда
+            # секунда последнего изменения прошла: иначе следующее
+            # изменение в ту же секунду клиент бы не заметил.
+            changed = int(max(versions))
+            if changed < int(time.time()):
+                last_modified = changed
+        return quote_etag(etag), last_modified
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = self.get_validator()
+        return conditional_response(
+            etag, last_modified, self.paginated_response, request, queryset
+        )
+
+    @action(detail=False)
+    def search(self, request):
+        """Поиск по названию, ингредиентам и описанию с ранжированием."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise exceptions.ValidationError({'q': 'Нужна строка поиска!'})
+        queryset = search_recipes(
+            self.filter_queryset(self.get_queryset()), query
+        )
+        etag, last_modified = self.get_validator()
+        return conditional_response(
+            etag, last_modified, self.paginated_response, request, queryset
+        )
+
+    @action(detail=False)
+    def cookable(self, request):
+        """Рецепты из имеющихся ингредиентов по доле покрытия."""
+        ingredients = get_ids(request, 'ingredients')
+        if not ingredients:
+            raise exceptions.ValidationError(
+                {'ingredients': 'Нужен хотя бы один ингредиент!'}
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = filter_ranked(queryset, cookable_index.search(
+            ingredients,
+            get_non_negative_int(request, 'max_missing'),
+            filtered_ids(queryset),
+        ))
+        etag, last_modified = self.get_validator()
+        return conditional_response(
+            etag, last_modified, self.paginated_response, request, queryset
+        )
+
+    def paginated_response(self, request, queryset):
+        page = self.paginate_queryset(self.values(queryset))
+        return self.get_paginated_response(self.represent(page, 'card'))
+
+    def retrieve(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validator()
+        return conditional_response(
+            etag, last_modified, self.detail_response, request, kwargs['pk']
+        )
+
+    def detail_response(self, request, pk):
+        recipe = generics.get_object_or_404(
+            self.values(self.filter_queryset(self.get_queryset())), pk=pk
+        )
+        return Response(self.represent([recipe], 'full')[0])
+
+    @staticmethod
+    def values(queryset):
+        """Строки рецептов для представления без RecipeGetSerializer."""
+        return queryset.prefetch_related(None).values(*RECIPE_FIELDS)
+
+    def represent(self, recipes, rendition):
+        return represent_page(
+            self.request, recipes, self.authors(self.request.user), rendition
+        )
 
     def get_serializer_class(self):
         """Выбор сериализатора для рецептов."""
@@ -183,29 +408,30 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(
         detail=False,
-        permission_classes=[permissions.IsAuthenticated]
+        permission_classes=[permissions.IsAuthenticated],
+        renderer_classes=[
+            ShoppingCartTextRenderer,
+            ShoppingCartCSVRenderer,
+            ShoppingCartJSONRenderer,
+        ],
     )
     def download_shopping_cart(self, request):
-        """Скачивание файла с корзиной."""
+        """Скачивание файла с корзиной в формате txt, csv или json."""
         user = request.user
+        renderer = request.accepted_renderer
 
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(cart_amount=Sum('amount'))
-        shopping_cart = ['Список покупок:']
-
-        for ingredient in ingredients:
-            shopping_cart.append(
-                f'{ingredient["ingredient__name"]} '
-                f'{ingredient["cart_amount"]} '
-                f'{ingredient["ingredient__measurement_unit"]}\n'
-            )
+        ingredients = ShoppingListItem.objects.filter(user=user).values(
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+            total_amount=F('amount'),
+        ).order_by('name', 'measurement_unit')
 
-        response = HttpResponse(shopping_cart, content_type='text/plain')
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator(chunk_size=CHUNK_SIZE)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
         response['Content-Disposition'] = (
-            f'{user.username}_shopping_cart.txt'
+            f'attachment; filename="{user.username}_shopping_cart.'
+            f'{renderer.format}"'
         )
         return response
@@ -1,7 +1,26 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+# В Django 4.2 синхронный код под ASGI выполняется в потоках
+# sync_to_async, и постоянное соединение остаётся за каждым из них
+# (тикет Django #33497). Поэтому по умолчанию соединение закрывается
+# после запроса; переиспользование соединений - через пулер (DB_POOLER).
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+
+class AsyncReadHandler(ASGIHandler):
+    """ASGI-приложение с асинхронными вьюхами чтения из foodgram.urls_asgi."""
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = 'foodgram.urls_asgi'
+        return request, error_response
+
+
+application = AsyncReadHandler()
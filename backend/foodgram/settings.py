@@ -64,15 +64,47 @@ DATABASES = {
     'default': {
         # 'ENGINE': 'django.db.backends.sqlite3',
         # 'NAME': BASE_DIR / 'db.sqlite3',
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # Под WSGI соединение живёт между запросами; перед повторным
+        # использованием проверяется, что оно не разорвано. foodgram.asgi
+        # задаёт по умолчанию 0.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        # За PgBouncer в режиме transaction серверные курсоры iterator()
+        # не переживают смену соединения между транзакциями.
+        'DISABLE_SERVER_SIDE_CURSORS': bool(int(os.getenv('DB_POOLER', 0))),
     }
 }
 
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+# Общий для процессов кеш (file, redis) нужен, чтобы сброс версий
+# справочников, рецептов и токенов был виден всем воркерам сразу.
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        'LOCATION': os.getenv('CACHE_LOCATION', {
+            'file': '/tmp/foodgram_cache',
+            'redis': 'redis://127.0.0.1:6379/1',
+            'memcached': '127.0.0.1:11211',
+        }.get(CACHE_BACKEND, 'foodgram')),
+        'KEY_PREFIX': 'foodgram',
+    }
+}
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 CSRF_TRUSTED_ORIGINS = ['http://127.0.0.1', 'http://localhost', 'https://paait.ru']
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -104,6 +136,10 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Предельный размер тела JSON-запроса и декодированного изображения рецепта.
+API_MAX_PAYLOAD_SIZE = int(os.getenv('API_MAX_PAYLOAD_SIZE', 16 * 1024 ** 2))
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv('RECIPE_IMAGE_MAX_SIZE', 10 * 1024 ** 2))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -111,7 +147,16 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.LimitedJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
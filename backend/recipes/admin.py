@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Ingredient, Recipe, RecipeIngredient, Tag
+from .models import (Ingredient, Recipe, RecipeIngredient, ShoppingListItem,
+                     Tag, recipe_amounts)
 
 
 @admin.register(Tag)
@@ -51,8 +52,13 @@ class RecipeAdmin(admin.ModelAdmin):
     empty_value_display = ' пусто '
     inlines = (InlineRecipeIngredient, )
 
+    def save_related(self, request, form, formsets, change):
+        old_amounts = recipe_amounts(form.instance) if change else {}
+        super().save_related(request, form, formsets, change)
+        ShoppingListItem.objects.recipe_changed(form.instance, old_amounts)
+
     @admin.display(
         description='Количество добавлений в избранное'
     )
     def add_to_favorite(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from api.caching import bump_version
+from api.constants import CHUNK_SIZE, RECIPES_CACHE
+from users.models import Subscribe, User
+from .models import Favorite, Recipe
+
+# (модель, поле-счётчик, модель связи, поле связи с моделью).
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscribe, 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарное изменение счётчика одним UPDATE ... SET field = field + d."""
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    rows.update(**{field: F(field) + delta})
+
+
+def reconcile_counters():
+    """Исправляет расхождения счётчиков с COUNT(*) по связям.
+
+    Возвращает число исправленных строк по каждому счётчику. После
+    исправлений меняется версия рецептов: счётчики входят в их ответы.
+    """
+    fixed = {}
+    for model, field, related, link in COUNTERS:
+        actual = Coalesce(
+            Subquery(
+                related.objects.filter(
+                    **{link: OuterRef('pk')}
+                ).order_by().values(link).annotate(
+                    total=Count('pk')
+                ).values('total')
+            ),
+            Value(0),
+        )
+        drifted = list(model.objects.annotate(actual=actual).exclude(
+            **{field: F('actual')}
+        ).values_list('pk', flat=True))
+        fixed[f'{model._meta.model_name}.{field}'] = sum(
+            model.objects.filter(
+                pk__in=drifted[start:start + CHUNK_SIZE]
+            ).update(**{field: actual})
+            for start in range(0, len(drifted), CHUNK_SIZE)
+        )
+    if any(fixed.values()):
+        transaction.on_commit(lambda: bump_version(RECIPES_CACHE))
+    return fixed
@@ -0,0 +1,125 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from io import BytesIO
+from operator import or_
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from api.caching import bump_version
+from api.constants import (IMAGE_QUALITY, IMAGE_RENDITIONS, IMAGE_WORKERS,
+                           RECIPES_CACHE)
+
+FORMAT, EXTENSION = (
+    ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+)
+
+executor = ThreadPoolExecutor(
+    max_workers=IMAGE_WORKERS, thread_name_prefix='renditions'
+)
+
+
+def rendition_field(rendition):
+    return f'image_{rendition}'
+
+
+def rendition_name(source, rendition):
+    """Путь к копии изображения, однозначно связанный с оригиналом."""
+    return f'renditions/{PurePosixPath(source).stem}_{rendition}.{EXTENSION}'
+
+
+def is_rendered(recipe):
+    """Готовы ли копии для текущего изображения рецепта."""
+    return all(
+        getattr(recipe, rendition_field(rendition)).name
+        == rendition_name(recipe.image.name, rendition)
+        for rendition in IMAGE_RENDITIONS
+    )
+
+
+def rendition_names(recipe):
+    """Пути к сохранённым копиям изображения рецепта."""
+    return [
+        getattr(recipe, rendition_field(rendition)).name
+        for rendition in IMAGE_RENDITIONS
+        if getattr(recipe, rendition_field(rendition))
+    ]
+
+
+def stale_renditions(recipe):
+    """Поля копий, сделанных не из текущего изображения, и пути к ним."""
+    stale = {}
+    for rendition in IMAGE_RENDITIONS:
+        name = getattr(recipe, rendition_field(rendition)).name
+        if name and (
+            not recipe.image
+            or name != rendition_name(recipe.image.name, rendition)
+        ):
+            stale[rendition_field(rendition)] = name
+    return stale
+
+
+def delete_renditions(names):
+    """Удаляет файлы копий, на которые не ссылается ни один рецепт."""
+    from .models import Recipe
+
+    names = set(names)
+    fields = [rendition_field(rendition) for rendition in IMAGE_RENDITIONS]
+    used = {
+        name
+        for row in Recipe.objects.filter(reduce(or_, (
+            Q(**{f'{field}__in': names}) for field in fields
+        ))).values_list(*fields)
+        for name in row
+    }
+    for name in names - used:
+        default_storage.delete(name)
+
+
+def save_rendition(image, source, rendition, size):
+    copy = image.copy()
+    copy.thumbnail(size, Image.LANCZOS)
+    if FORMAT == 'JPEG' or copy.mode not in ('RGB', 'RGBA'):
+        copy = copy.convert('RGBA' if FORMAT == 'WEBP' else 'RGB')
+    buffer = BytesIO()
+    copy.save(buffer, FORMAT, quality=IMAGE_QUALITY)
+    name = rendition_name(source, rendition)
+    default_storage.delete(name)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def render_recipe_images(pk):
+    """Нарезает копии изображения рецепта и сохраняет их пути."""
+    from .models import Recipe
+
+    try:
+        recipe = Recipe.objects.filter(pk=pk).first()
+        if recipe is None or not recipe.image or is_rendered(recipe):
+            return
+        source = recipe.image.name
+        with recipe.image.open('rb') as file, Image.open(file) as image:
+            image = ImageOps.exif_transpose(image)
+            names = {
+                rendition_field(rendition): save_rendition(
+                    image, source, rendition, size
+                )
+                for rendition, size in IMAGE_RENDITIONS.items()
+            }
+        # update() не вызывает post_save: версию рецептов для ETag
+        # меняем сами.
+        if Recipe.objects.filter(pk=pk, image=source).update(
+            updated_at=timezone.now(), **names
+        ):
+            bump_version(RECIPES_CACHE)
+    finally:
+        connections.close_all()
+
+
+def schedule_recipe_images(pk):
+    """Передаёт нарезку копий в пул потоков, не задерживая запрос."""
+    return executor.submit(render_recipe_images, pk)
@@ -1,23 +1,58 @@
 import csv
+import json
+import time
+from itertools import islice
 from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from api.caching import bump_version
+from api.constants import CHUNK_SIZE, INGREDIENTS_CACHE, RECIPES_CACHE
+from api.search import journal_recipes, update_search_vectors
 from foodgram.settings import BASE_DIR
-from recipes.models import Ingredient
+from recipes.models import Ingredient, Recipe, RecipeIngredient
 
 PATH = Path(BASE_DIR, 'data', 'ingredients.csv')
 
 
 def clear_data(self):
+    """Удаление ингредиентов вместе с их строками в рецептах.
+
+    Рецепты, потерявшие ингредиенты, после коммита попадают в журнал
+    индексов поиска и подбора, а версия рецептов меняется для ETag.
+    """
+    ids = list(
+        RecipeIngredient.objects.values_list('recipe_id', flat=True).distinct()
+    )
     Ingredient.objects.all().delete()
+    if ids:
+        update_search_vectors(Recipe.objects.filter(pk__in=ids))
+        transaction.on_commit(lambda: journal_recipes(ids))
+        transaction.on_commit(lambda: bump_version(RECIPES_CACHE))
     self.stdout.write(
         self.style.WARNING('Существующие записи ингредиентов были удалены.')
     )
 
 
+def read_csv(file):
+    for name, measurement_unit in csv.reader(file):
+        yield name, measurement_unit
+
+
+def read_json(file):
+    for row in json.load(file):
+        yield row['name'], row['measurement_unit']
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
 class Command(BaseCommand):
-    help = "Загружает CSV данные из файла data."
+    help = "Загружает ингредиенты из CSV или JSON файла."
 
     def add_arguments(self, parser):
         # Аргумент для удаления всех имеющихся в БД данных
@@ -28,21 +63,56 @@ class Command(BaseCommand):
             default=False,
             help='Удаляет предыдущие данные',
         )
+        parser.add_argument(
+            '--path',
+            type=Path,
+            default=PATH,
+            help='Путь к файлу .csv или .json',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Количество записей в одном INSERT',
+        )
 
     def handle(self, *args, **options):
         """Загрузка Ингредиентов."""
+        path = options['path']
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError(
+                f'Неподдерживаемый формат файла: {path.suffix}'
+            )
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
 
-        if options['delete_existing']:
-            clear_data(self)
-        with open(
-            PATH, encoding='utf-8', newline=''
-        ) as csvfile:
-            reader = csv.reader(csvfile)
-            for name, measurement_unit in reader:
-                Ingredient.objects.get_or_create(
-                    name=name, measurement_unit=measurement_unit
+        start = time.perf_counter()
+        rows = 0
+        with transaction.atomic():
+            if options['delete_existing']:
+                clear_data(self)
+            existing = Ingredient.objects.count()
+            with open(path, encoding='utf-8', newline='') as file:
+                ingredients = (
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in reader(file)
                 )
+                while batch := list(
+                    islice(ingredients, options['batch_size'])
+                ):
+                    Ingredient.objects.bulk_create(
+                        batch, ignore_conflicts=True
+                    )
+                    rows += len(batch)
+            created = Ingredient.objects.count() - existing
+        bump_version(INGREDIENTS_CACHE)
+        elapsed = time.perf_counter() - start
 
         self.stdout.write(
-            self.style.SUCCESS('Записи ингредиентов сохранены')
+            self.style.SUCCESS(
+                f'Записи ингредиентов сохранены: прочитано {rows}, '
+                f'добавлено {created}, пропущено {rows - created} '
+                f'за {elapsed:.2f} с ({rows / max(elapsed, 1e-6):.0f} строк/с)'
+            )
         )
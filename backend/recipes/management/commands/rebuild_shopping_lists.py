@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает списки покупок пользователей по их корзинам."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            nargs='+',
+            dest='users',
+            help='id пользователей; по умолчанию пересчитываются все',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = ShoppingListItem.objects.rebuild(options['users'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано позиций списков покупок: {count}')
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет счётчики избранного, рецептов и подписчиков с COUNT(*) '
+        'по связям и исправляет расхождения.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = reconcile_counters()
+        for counter, count in fixed.items():
+            self.stdout.write(f'{counter}: исправлено {count}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены.'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import executor, render_recipe_images
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Создаёт копии изображений рецептов, у которых их ещё нет."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipe',
+            type=int,
+            nargs='+',
+            dest='recipes',
+            help='id рецептов; по умолчанию обрабатываются все',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').order_by('pk')
+        if options['recipes']:
+            recipes = recipes.filter(pk__in=options['recipes'])
+        pks = list(recipes.values_list('pk', flat=True))
+        for _ in executor.map(render_recipe_images, pks):
+            pass
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано рецептов: {len(pks)}')
+        )
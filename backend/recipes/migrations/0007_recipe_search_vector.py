@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-18 16:54
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_SQL = '''
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS recipe_search_vector_idx
+    ON recipes_recipe USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS recipe_name_trgm_idx
+    ON recipes_recipe USING gin (name gin_trgm_ops);
+UPDATE recipes_recipe AS recipe SET search_vector =
+    setweight(to_tsvector('russian', recipe.name), 'A')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipes_recipeingredient AS item
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = item.ingredient_id
+        WHERE item.recipe_id = recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector('russian', recipe.text), 'C');
+'''
+
+DROP_SQL = '''
+DROP INDEX IF EXISTS recipe_search_vector_idx;
+DROP INDEX IF EXISTS recipe_name_trgm_idx;
+'''
+
+
+def postgresql_only(sql):
+    """GIN-индексы и заполнение векторов есть только в Postgres."""
+
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(
+            postgresql_only(CREATE_SQL), postgresql_only(DROP_SQL)
+        ),
+    ]
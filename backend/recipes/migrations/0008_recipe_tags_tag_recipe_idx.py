@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-18 16:58
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_search_vector'),
+    ]
+
+    operations = [
+        # Фильтр по тегам идёт от tag_id: индекс (tag_id, recipe_id)
+        # отвечает на EXISTS без чтения таблицы.
+        migrations.RunSQL(
+            'CREATE INDEX recipe_tags_tag_recipe_idx '
+            'ON recipes_recipe_tags (tag_id, recipe_id);',
+            'DROP INDEX recipe_tags_tag_recipe_idx;',
+        ),
+    ]
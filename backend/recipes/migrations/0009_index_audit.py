@@ -0,0 +1,51 @@
+# Generated by Django 4.2 on 2026-10-18 17:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Префиксный поиск lower(name) LIKE 'abc%' использует индекс в Postgres
+# только с text_pattern_ops, если локаль базы не C.
+CREATE_SQL = '''
+CREATE INDEX IF NOT EXISTS ingredient_name_pattern_idx
+    ON recipes_ingredient (lower(name) text_pattern_ops);
+'''
+
+DROP_SQL = 'DROP INDEX IF EXISTS ingredient_name_pattern_idx;'
+
+
+def postgresql_only(sql):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0008_recipe_tags_tag_recipe_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            postgresql_only(CREATE_SQL), postgresql_only(DROP_SQL)
+        ),
+        migrations.AlterField(
+            model_name='favorite',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='shoppinglistitem',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+    ]
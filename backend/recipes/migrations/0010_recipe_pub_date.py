@@ -0,0 +1,83 @@
+# Generated by Django 4.2 on 2026-10-18 17:04
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models, transaction
+from django.utils import timezone
+
+BATCH_SIZE = 2000
+
+
+def fill_pub_date(apps, schema_editor):
+    """Дата публикации существующих рецептов.
+
+    Настоящая дата неизвестна: updated_at после 0005 у всех рецептов -
+    время той миграции, а у изменённых - дата правки. Поэтому рецепты
+    получают разные даты в порядке id, с шагом в секунду, и последний
+    опубликован в момент миграции: порядок ('-pub_date', '-id') для них
+    совпадает с порядком создания, а новые рецепты идут раньше.
+
+    Заполняется порциями по первичному ключу, каждая порция в своей
+    транзакции: блокируются только строки текущей порции.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipes = Recipe.objects.using(schema_editor.connection.alias)
+    now = timezone.now()
+    last_id = recipes.aggregate(last_id=models.Max('pk'))['last_id']
+    last = 0
+    while True:
+        batch = list(
+            recipes.filter(pk__gt=last).order_by('pk').only('pk')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for recipe in batch:
+            recipe.pub_date = now - timedelta(seconds=last_id - recipe.pk)
+        with transaction.atomic(using=schema_editor.connection.alias):
+            recipes.bulk_update(batch, ['pub_date'])
+        last = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Без общей транзакции, чтобы порции заполнения коммитились отдельно.
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0009_index_audit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='pub_date',
+            field=models.DateTimeField(null=True, verbose_name='Дата публикации'),
+        ),
+        migrations.RunPython(fill_pub_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='recipe',
+            name='pub_date',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата публикации'),
+        ),
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ('-pub_date', '-id'), 'verbose_name': 'Рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_idx'),
+        ),
+        # Составной индекс по автору создаётся раньше, чем удаляется
+        # индекс внешнего ключа author.
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recipes', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+    ]
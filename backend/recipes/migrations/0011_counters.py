@@ -0,0 +1,52 @@
+# Generated by Django 4.2 on 2026-10-18 17:03
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+# (приложение, модель, поле-счётчик, модель связи, поле связи).
+COUNTERS = (
+    ('recipes', 'Recipe', 'favorites_count', 'Favorite', 'recipe'),
+    ('users', 'User', 'recipes_count', 'Recipe', 'author'),
+    ('users', 'User', 'subscribers_count', 'Subscribe', 'author'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    """Начальные значения счётчиков - COUNT(*) по связям."""
+    alias = schema_editor.connection.alias
+    for app, model, field, related, link in COUNTERS:
+        Model = apps.get_model(app, model)
+        Related = apps.get_model(
+            'users' if related == 'Subscribe' else 'recipes', related
+        )
+        Model.objects.using(alias).update(**{field: Coalesce(
+            models.Subquery(
+                Related.objects.using(alias).filter(
+                    **{link: models.OuterRef('pk')}
+                ).order_by().values(link).annotate(
+                    total=models.Count('pk')
+                ).values('total')
+            ),
+            models.Value(0),
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_pub_date'),
+        ('users', '0004_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-pub_date', '-id'], name='recipe_popular_idx'),
+        ),
+    ]
@@ -1,9 +1,12 @@
 from colorfield import fields
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core import validators
 from django.db import models
+from django.db.models.functions import Lower
 
-from api.constants import MAX_LENGHT, VALID_MAX, VALID_MIN
+from api.constants import CHUNK_SIZE, MAX_LENGHT, VALID_MAX, VALID_MIN
+from users.models import CountersMixin
 
 User = get_user_model()
 
@@ -50,6 +53,9 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        indexes = [
+            models.Index(Lower('name'), name='ingredient_name_lower_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['name', 'measurement_unit'],
@@ -61,7 +67,7 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(CountersMixin, models.Model):
     """Модель рецепта."""
     tags = models.ManyToManyField(
         Tag,
@@ -73,6 +79,7 @@ class Recipe(models.Model):
         verbose_name='Автор',
         related_name='recipes',
         on_delete=models.CASCADE,
+        db_index=False,
     )
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -87,6 +94,21 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Изображение',
     )
+    image_thumbnail = models.ImageField(
+        verbose_name='Миниатюра',
+        blank=True,
+        editable=False,
+    )
+    image_card = models.ImageField(
+        verbose_name='Изображение для карточки',
+        blank=True,
+        editable=False,
+    )
+    image_full = models.ImageField(
+        verbose_name='Изображение для страницы рецепта',
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         verbose_name='Описание',
     )
@@ -101,10 +123,45 @@ class Recipe(models.Model):
             )
         ]
     )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+        auto_now_add=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    counter_fields = ('favorites_count',)
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', '-pub_date', '-id'),
+                name='recipe_popular_idx',
+            ),
+            # Рецепты автора, новые первыми: фильтр author и лента подписок.
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -150,9 +207,12 @@ class RecipeIngredient(models.Model):
 
 
 class AbstractRecipeModel(models.Model):
+    # Отдельный индекс по user не нужен: это префикс уникального
+    # индекса (user, recipe).
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Пользователь',
     )
     recipe = models.ForeignKey(
@@ -193,3 +253,125 @@ class ShoppingCart(AbstractRecipeModel):
                 name='unique_shopping_cart_user_recipe'
             )
         ]
+
+
+class ShoppingListManager(models.Manager):
+    """Инкрементальное обновление агрегированных списков покупок."""
+
+    def apply(self, user_ids, amounts, sign=1):
+        """Добавляет (sign=1) или вычитает (sign=-1) количества
+        ингредиентов {ingredient_id: amount} в списках пользователей."""
+        user_ids = list(user_ids)
+        amounts = {
+            ingredient: sign * amount
+            for ingredient, amount in amounts.items() if amount
+        }
+        if not user_ids or not amounts:
+            return
+        self.bulk_create(
+            (
+                self.model(user_id=user, ingredient_id=ingredient, amount=0)
+                for user in user_ids for ingredient in amounts
+            ),
+            ignore_conflicts=True,
+        )
+        self.filter(
+            user__in=user_ids, ingredient__in=amounts
+        ).update(amount=models.F('amount') + models.Case(
+            *(
+                models.When(ingredient=ingredient, then=delta)
+                for ingredient, delta in amounts.items()
+            ),
+            default=0,
+        ))
+        self.filter(
+            user__in=user_ids, ingredient__in=amounts, amount__lte=0
+        ).delete()
+
+    def recipe_changed(self, recipe, old_amounts, new_amounts=None):
+        """Переносит изменение состава рецепта в списки покупок
+        пользователей, у которых рецепт лежит в корзине."""
+        if new_amounts is None:
+            new_amounts = recipe_amounts(recipe)
+        delta = {
+            ingredient: (
+                new_amounts.get(ingredient, 0) - old_amounts.get(ingredient, 0)
+            )
+            for ingredient in new_amounts.keys() | old_amounts.keys()
+        }
+        self.apply(
+            ShoppingCart.objects.filter(
+                recipe=recipe
+            ).values_list('user_id', flat=True),
+            delta,
+        )
+
+    def rebuild(self, users=None):
+        """Пересчитывает списки покупок с нуля."""
+        items = self.all()
+        carts = ShoppingCart.objects.all()
+        if users is not None:
+            items = items.filter(user__in=users)
+            carts = carts.filter(user__in=users)
+        items.delete()
+        totals = carts.values(
+            'user', ingredient=models.F('recipe__ingredient_list__ingredient')
+        ).annotate(
+            total_amount=models.Sum('recipe__ingredient_list__amount')
+        ).order_by()
+        return len(self.bulk_create(
+            (
+                self.model(
+                    user_id=total['user'],
+                    ingredient_id=total['ingredient'],
+                    amount=total['total_amount'],
+                )
+                for total in totals.iterator(chunk_size=CHUNK_SIZE)
+                if total['ingredient'] is not None
+            ),
+            batch_size=CHUNK_SIZE,
+        ))
+
+
+def recipe_amounts(recipe):
+    """Состав рецепта в виде {ingredient_id: amount}."""
+    return dict(
+        RecipeIngredient.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', 'amount')
+    )
+
+
+class ShoppingListItem(models.Model):
+    """Модель агрегированного списка покупок пользователя."""
+    # Индекс по user - префикс уникального индекса (user, ingredient).
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        db_index=False,
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество',
+    )
+
+    objects = ShoppingListManager()
+
+    class Meta:
+        default_related_name = 'shopping_list'
+        verbose_name = 'Список покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_user_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.ingredient} {self.amount}'
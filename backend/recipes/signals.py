@@ -0,0 +1,189 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import tokens_namespace
+from api.caching import bump_version
+from api.constants import INGREDIENTS_CACHE, RECIPES_CACHE, TAGS_CACHE
+from api.search import journal_recipes, update_search_vectors
+from api.viewer import reset_viewer_state
+from users.models import Subscribe, User
+from .counters import change_counter
+from .images import (delete_renditions, is_rendered, rendition_names,
+                     schedule_recipe_images, stale_renditions)
+from .models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                     ShoppingListItem, Tag, recipe_amounts)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def reset_tags_cache(sender, **kwargs):
+    """Сброс кеша тегов."""
+    bump_version(TAGS_CACHE)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def reset_ingredients_cache(sender, **kwargs):
+    """Сброс кеша и индекса автодополнения ингредиентов."""
+    bump_version(INGREDIENTS_CACHE)
+
+
+def reset_recipes_version():
+    """Смена версии рецептов для ETag после коммита.
+
+    До коммита клиент мог бы получить новый ETag вместе со старыми данными.
+    """
+    transaction.on_commit(lambda: bump_version(RECIPES_CACHE))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=Favorite)
+def reset_recipes_cache(sender, **kwargs):
+    """Изменение, удаление рецепта или его счётчика избранного.
+
+    Ингредиенты рецепта меняются вместе с сохранением самого рецепта.
+    """
+    reset_recipes_version()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def reset_recipe_tags_cache(sender, action, **kwargs):
+    """Изменение тегов рецепта."""
+    if action.startswith('post_'):
+        reset_recipes_version()
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, **kwargs):
+    """Переиндексация рецептов с переименованным ингредиентом."""
+    if not created:
+        ids = list(Recipe.objects.filter(
+            ingredients=instance
+        ).values_list('pk', flat=True))
+        update_search_vectors(Recipe.objects.filter(pk__in=ids))
+        transaction.on_commit(lambda: journal_recipes(ids))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    """Добавление ингредиентов рецепта в список покупок."""
+    if created:
+        ShoppingListItem.objects.apply(
+            [instance.user_id], recipe_amounts(instance.recipe_id)
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    """Вычитание ингредиентов рецепта из списка покупок."""
+    ShoppingListItem.objects.apply(
+        [instance.user_id], recipe_amounts(instance.recipe_id), sign=-1
+    )
+
+
+@receiver(pre_save, sender=Recipe)
+def drop_stale_renditions(sender, instance, **kwargs):
+    """Копии прежнего изображения не отдаются вместо нового.
+
+    Поля копий очищаются до сохранения, файлы удаляются после коммита.
+    """
+    stale = stale_renditions(instance)
+    for field in stale:
+        setattr(instance, field, '')
+    if stale:
+        transaction.on_commit(lambda: delete_renditions(stale.values()))
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_renditions(sender, instance, **kwargs):
+    """Файлы копий удалённого рецепта удаляются после коммита."""
+    names = rendition_names(instance)
+    if names:
+        transaction.on_commit(lambda: delete_renditions(names))
+
+
+@receiver(post_save, sender=Recipe)
+def render_images(sender, instance, **kwargs):
+    """Нарезка копий нового изображения рецепта после коммита."""
+    if instance.image and not is_rendered(instance):
+        transaction.on_commit(lambda: schedule_recipe_images(instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def reindex_recipe(sender, instance, **kwargs):
+    """Обновление поискового индекса после коммита рецепта и ингредиентов."""
+    def reindex():
+        update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+        journal_recipes([instance.pk])
+
+    transaction.on_commit(reindex)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    """Удалённый рецепт пропадает из индексов в памяти."""
+    pk = instance.pk
+    transaction.on_commit(lambda: journal_recipes([pk]))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+def count_favorites(sender, instance, created=False, **kwargs):
+    """Счётчик добавлений рецепта в избранное."""
+    if kwargs['signal'] is post_delete or created:
+        change_counter(
+            Recipe, instance.recipe_id, 'favorites_count',
+            1 if created else -1,
+        )
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def count_recipes(sender, instance, created=False, **kwargs):
+    """Счётчик рецептов автора."""
+    if kwargs['signal'] is post_delete or created:
+        change_counter(
+            User, instance.author_id, 'recipes_count', 1 if created else -1
+        )
+
+
+@receiver((post_save, post_delete), sender=Subscribe)
+def count_subscribers(sender, instance, created=False, **kwargs):
+    """Счётчик подписчиков автора."""
+    if kwargs['signal'] is post_delete or created:
+        change_counter(
+            User, instance.author_id, 'subscribers_count',
+            1 if created else -1,
+        )
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscribe)
+def reset_user_state(sender, instance, **kwargs):
+    """Сброс закешированных избранного, корзины или подписок после коммита."""
+    user_id = instance.user_id
+    name = {
+        Favorite: 'favorites',
+        ShoppingCart: 'shopping_cart',
+        Subscribe: 'subscriptions',
+    }[sender]
+    transaction.on_commit(lambda: reset_viewer_state(user_id, name))
+
+
+@receiver(post_delete, sender=Token)
+def reset_token_cache(sender, instance, **kwargs):
+    """Выход пользователя: его токены больше не берутся из кеша."""
+    bump_version(tokens_namespace(instance.user_id))
+
+
+@receiver((post_save, post_delete), sender=User)
+def reset_user_tokens_cache(sender, instance, update_fields=None, **kwargs):
+    """Удаление или изменение пользователя, в том числе снятие is_active.
+
+    Сбрасываются его токены и версия рецептов: в них есть данные автора.
+    Обновление одного last_login при входе кеш не сбрасывает.
+    """
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_version(tokens_namespace(instance.pk))
+    reset_recipes_version()
@@ -0,0 +1,77 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class FoodgramTestCase(TestCase):
+    """Общая основа тестов: медиа во временном каталоге, пустой кеш,
+    нарезка копий изображений отключена.
+
+    Сигналы меняют версии и индексы после коммита, поэтому изменения
+    выполняются внутри self.commit().
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('recipes.signals.schedule_recipe_images')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def commit(self):
+        """Выполнение колбэков on_commit, как после коммита транзакции."""
+        return self.captureOnCommitCallbacks(execute=True)
+
+    @staticmethod
+    def create_user(name):
+        return User.objects.create_user(
+            email=f'{name}@example.com',
+            username=name,
+            first_name=name.title(),
+            last_name=name.title(),
+            password='Foodgram-test-123',
+        )
+
+    @staticmethod
+    def create_tag(slug):
+        return Tag.objects.create(
+            name=slug.title(),
+            color=f'#{Tag.objects.count():06X}',
+            slug=slug,
+        )
+
+    @staticmethod
+    def create_ingredient(name, unit='г'):
+        return Ingredient.objects.create(name=name, measurement_unit=unit)
+
+    def create_recipe(self, author, amounts=None, tags=(), name='Рецепт'):
+        """Рецепт с ингредиентами {ingredient: amount} и тегами."""
+        with self.commit():
+            recipe = Recipe.objects.create(
+                author=author,
+                name=name,
+                text='Описание',
+                cooking_time=10,
+                image='recipes/test.png',
+            )
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                )
+                for ingredient, amount in (amounts or {}).items()
+            )
+        return recipe
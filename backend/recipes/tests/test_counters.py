@@ -0,0 +1,96 @@
+from rest_framework.test import APIClient
+
+from recipes.counters import reconcile_counters
+from recipes.models import Favorite, Recipe
+from users.models import Subscribe, User
+from .base import FoodgramTestCase
+
+
+class CountersTest(FoodgramTestCase):
+    """Счётчики избранного, рецептов и подписчиков."""
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user('author')
+        self.reader = self.create_user('reader')
+        self.tag = self.create_tag('lunch')
+        self.salt = self.create_ingredient('соль')
+        self.recipe = self.create_recipe(
+            self.author, {self.salt: 5}, [self.tag]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def test_counters_follow_links(self):
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 1)
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        Favorite.objects.filter(user=self.reader).get().delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+
+    def test_save_keeps_counters(self):
+        """Полный save() объекта, загруженного до изменения счётчиков."""
+        author = User.objects.get(pk=self.author.pk)
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        Subscribe.objects.create(user=self.reader, author=self.author)
+        self.create_recipe(self.author, name='Второй')
+        author.first_name = 'Новое имя'
+        author.save()
+        recipe.name = 'Новое название'
+        recipe.save()
+        author.refresh_from_db()
+        recipe.refresh_from_db()
+        self.assertEqual(author.first_name, 'Новое имя')
+        self.assertEqual(author.recipes_count, 2)
+        self.assertEqual(author.subscribers_count, 1)
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.favorites_count, 1)
+
+    def test_recipe_update_keeps_favorites_count(self):
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        client = APIClient()
+        client.force_authenticate(self.author)
+        with self.commit():
+            response = client.patch(
+                f'/api/recipes/{self.recipe.pk}/',
+                {
+                    'name': 'Другое название',
+                    'tags': [self.tag.pk],
+                    'ingredients': [{'id': self.salt.pk, 'amount': 5}],
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Другое название')
+        self.assertEqual(self.recipe.favorites_count, 1)
+
+    def test_subscribe_response_shows_new_count(self):
+        response = self.client.post(f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['subscribers_count'], 1)
+        self.assertEqual(response.data['recipes_count'], 1)
+
+    def test_reconcile_counters(self):
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        Recipe.objects.update(favorites_count=7)
+        User.objects.filter(pk=self.author.pk).update(
+            recipes_count=0, subscribers_count=3
+        )
+        with self.commit():
+            fixed = reconcile_counters()
+        self.assertEqual(fixed, {
+            'recipe.favorites_count': 1,
+            'user.recipes_count': 1,
+            'user.subscribers_count': 1,
+        })
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertEqual(
+            (self.author.recipes_count, self.author.subscribers_count), (1, 0)
+        )
@@ -0,0 +1,35 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient
+from .base import FoodgramTestCase
+
+
+class DownloadDataTest(FoodgramTestCase):
+    """Загрузка ингредиентов с удалением прежних."""
+
+    def test_delete_existing_updates_recipe_indexes(self):
+        salt = self.create_ingredient('соль')
+        self.create_recipe(
+            self.create_user('cook'), {salt: 5}, [self.create_tag('lunch')]
+        )
+        client = APIClient()
+        url = f'/api/recipes/cookable/?ingredients={salt.pk}'
+        self.assertEqual(client.get(url).data['count'], 1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'ingredients.csv')
+            path.write_text('сахар,г\n', encoding='utf-8')
+            with self.commit():
+                call_command(
+                    'download_data', delete_existing=True, path=path,
+                    stdout=StringIO(),
+                )
+        self.assertEqual(
+            list(Ingredient.objects.values_list('name', flat=True)),
+            ['сахар'],
+        )
+        self.assertEqual(client.get(url).data['count'], 0)
@@ -0,0 +1,102 @@
+from rest_framework.test import APIClient
+
+from recipes.models import ShoppingListItem
+from .base import FoodgramTestCase
+
+
+class ShoppingListTest(FoodgramTestCase):
+    """Список покупок следует за корзиной и составом рецептов."""
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.create_user('author')
+        self.buyer = self.create_user('buyer')
+        self.tag = self.create_tag('lunch')
+        self.salt = self.create_ingredient('соль')
+        self.sugar = self.create_ingredient('сахар')
+        self.flour = self.create_ingredient('мука')
+        self.soup = self.create_recipe(
+            self.author, {self.salt: 5, self.flour: 100}, [self.tag], 'Суп'
+        )
+        self.cake = self.create_recipe(
+            self.author, {self.sugar: 50, self.flour: 200}, [self.tag], 'Торт'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def shopping_list(self, user=None):
+        return dict(ShoppingListItem.objects.filter(
+            user=user or self.buyer
+        ).values_list('ingredient_id', 'amount'))
+
+    def add_to_cart(self, recipe):
+        with self.commit():
+            response = self.client.post(
+                f'/api/recipes/{recipe.pk}/shopping_cart/'
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def test_add_and_remove(self):
+        self.add_to_cart(self.soup)
+        self.add_to_cart(self.cake)
+        self.assertEqual(self.shopping_list(), {
+            self.salt.pk: 5, self.sugar.pk: 50, self.flour.pk: 300,
+        })
+        with self.commit():
+            response = self.client.delete(
+                f'/api/recipes/{self.soup.pk}/shopping_cart/'
+            )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            self.shopping_list(), {self.sugar.pk: 50, self.flour.pk: 200}
+        )
+
+    def test_amount_change(self):
+        self.add_to_cart(self.soup)
+        self.add_to_cart(self.cake)
+        author = APIClient()
+        author.force_authenticate(self.author)
+        with self.commit():
+            response = author.patch(
+                f'/api/recipes/{self.soup.pk}/',
+                {
+                    'tags': [self.tag.pk],
+                    'ingredients': [
+                        {'id': self.salt.pk, 'amount': 7},
+                        {'id': self.sugar.pk, 'amount': 10},
+                    ],
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.shopping_list(), {
+            self.salt.pk: 7, self.sugar.pk: 60, self.flour.pk: 200,
+        })
+
+    def test_recipe_delete(self):
+        self.add_to_cart(self.soup)
+        self.add_to_cart(self.cake)
+        author = APIClient()
+        author.force_authenticate(self.author)
+        with self.commit():
+            response = author.delete(f'/api/recipes/{self.cake.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            self.shopping_list(), {self.salt.pk: 5, self.flour.pk: 100}
+        )
+
+    def test_apply_and_rebuild(self):
+        self.add_to_cart(self.soup)
+        ShoppingListItem.objects.apply(
+            [self.buyer.pk, self.author.pk],
+            {self.salt.pk: -5, self.sugar.pk: 3},
+        )
+        self.assertEqual(
+            self.shopping_list(), {self.sugar.pk: 3, self.flour.pk: 100}
+        )
+        self.assertEqual(self.shopping_list(self.author), {self.sugar.pk: 3})
+        ShoppingListItem.objects.rebuild()
+        self.assertEqual(
+            self.shopping_list(), {self.salt.pk: 5, self.flour.pk: 100}
+        )
+        self.assertEqual(self.shopping_list(self.author), {})
@@ -22,11 +22,11 @@ class UserAdmin(admin.ModelAdmin):
 
     @admin.display(description='Количество рецептов')
     def recipes(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     @admin.display(description='Количество подписчиков')
     def subscribers(self, obj):
-        return obj.subscriber.count()
+        return obj.subscribers_count
 
 
 @admin.register(Subscribe)
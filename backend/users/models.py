@@ -5,7 +5,32 @@ from django.db import models
 from api.constants import MAX_LENGHT_EMAIL, MAX_LENGHT_USER
 
 
-class User(AbstractUser):
+class CountersMixin:
+    """Счётчики в counter_fields меняются только UPDATE ... F()
+    (recipes/counters.py), поэтому save() существующей строки без
+    update_fields их не перезаписывает: иначе в базу вернулось бы
+    значение, загруженное вместе с объектом.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+            and not self._state.adding
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CountersMixin, AbstractUser):
     """Модель пользователя."""
     email = models.EmailField(
         verbose_name='Адрес электронной почты',
@@ -31,6 +56,17 @@ class User(AbstractUser):
     last_name = models.CharField(
         max_length=MAX_LENGHT_USER,
         verbose_name='Фамилия')
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False,
+    )
+    counter_fields = ('recipes_count', 'subscribers_count')
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = (
         'username',
@@ -55,11 +91,13 @@ class Subscribe(models.Model):
         related_name='subscribing',
         on_delete=models.CASCADE,
     )
+    # Индекс по user - префикс уникального индекса (user, author).
     user = models.ForeignKey(
         User,
         verbose_name='Подписчик',
         related_name='subscriber',
         on_delete=models.CASCADE,
+        db_index=False,
     )
 
     class Meta: